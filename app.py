@@ -1,3 +1,4 @@
+import logging
 import os
 try:
     from dotenv import load_dotenv
@@ -5,11 +6,17 @@ try:
 except Exception:
     pass
 
+# Default to INFO so per-request debug logging is a no-op in production
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
+
 from flask import Flask, send_from_directory
 from flask_restful import Api
 from flask_migrate import Migrate
-from database import engine  # Import to ensure database is initialized
+from database import engine, start_exp_count_refresh  # Import to ensure database is initialized
 from models import Base
+from lib.serialization import FastJSONProvider, restful_json_output
+from lib.query_counter import install_query_counter
+from config import DEFAULT_QUERY_COUNT_LIMIT, EXP_COUNT_REFRESH_INTERVAL, QUERY_COUNT_CHECKS, QUERY_COUNT_LIMITS
 
 from routes.Experts import ExpertResource, ExpertListResource
 from routes.experiences import ExperienceResource, ExperienceListResource
@@ -19,6 +26,11 @@ from routes.prompts import PromptResource, PromptListResource, PromptByNameResou
 from routes.solicitation_roles import SolicitationRolesListResource, SolicitationRoleResource
 
 app = Flask(__name__)
+# Serialize jsonify() responses with orjson when it is installed
+app.json = FastJSONProvider(app)
+
+if QUERY_COUNT_CHECKS:
+    install_query_counter(app, engine, QUERY_COUNT_LIMITS, DEFAULT_QUERY_COUNT_LIMIT)
 
 # Create a mock db object for Flask-Migrate
 class MockDB:
@@ -33,22 +45,24 @@ class MockDB:
 db = MockDB()
 migrate = Migrate(app, db)
 api = Api(app)
+api.representation('application/json')(restful_json_output)
 
-api.add_resource(ExpertListResource, '/api/experts')
-api.add_resource(ExpertResource, '/api/experts/<int:expert_id>')
+# Plain Flask views: responses are serialized once by lib.serialization.json_view
+app.add_url_rule('/api/experts', view_func=ExpertListResource.as_view('expert_list'))
+app.add_url_rule('/api/experts/<int:expert_id>', view_func=ExpertResource.as_view('expert'))
 
-api.add_resource(ExperienceListResource, '/api/experiences')
-api.add_resource(ExperienceResource, '/api/experiences/<int:experience_id>')
+app.add_url_rule('/api/experiences', view_func=ExperienceListResource.as_view('experience_list'))
+app.add_url_rule('/api/experiences/<int:experience_id>', view_func=ExperienceResource.as_view('experience'))
 
-api.add_resource(AttributeListResource, '/api/attributes')
-api.add_resource(AttributeResource, '/api/attributes/<int:attribute_id>')
+app.add_url_rule('/api/attributes', view_func=AttributeListResource.as_view('attribute_list'))
+app.add_url_rule('/api/attributes/<int:attribute_id>', view_func=AttributeResource.as_view('attribute'))
 
 api.add_resource(ExpertSearchResource, '/api/experts/search')
 
-api.add_resource(PromptListResource, '/api/prompts')
-api.add_resource(PromptResource, '/api/prompts/<int:prompt_id>')
-api.add_resource(PromptVersionActivateResource, '/api/prompts/<int:prompt_id>/activate')
-api.add_resource(PromptByNameResource, '/api/prompts/by-name/<string:template_name>')
+app.add_url_rule('/api/prompts', view_func=PromptListResource.as_view('prompt_list'))
+app.add_url_rule('/api/prompts/<int:prompt_id>', view_func=PromptResource.as_view('prompt'))
+app.add_url_rule('/api/prompts/<int:prompt_id>/activate', view_func=PromptVersionActivateResource.as_view('prompt_activate'))
+app.add_url_rule('/api/prompts/by-name/<string:template_name>', view_func=PromptByNameResource.as_view('prompt_by_name'))
 
 api.add_resource(SolicitationRolesListResource, '/api/solicitation-roles')
 api.add_resource(SolicitationRoleResource, '/api/solicitation-roles/<string:role_id>')
@@ -103,4 +117,5 @@ if __name__ == '__main__':
     sys.stdout.reconfigure(line_buffering=True)
     sys.stderr.reconfigure(line_buffering=True)
     
+    start_exp_count_refresh(EXP_COUNT_REFRESH_INTERVAL)
     app.run(host=host, port=port, debug=debug)
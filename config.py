@@ -3,6 +3,49 @@
 import os
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+
+# Seconds a cached GET response body stays valid
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 60))
+
+# Raise on relationship lazy loads not covered by eager-loading options (dev/test only)
+STRICT_EAGER_LOADING = os.getenv('STRICT_EAGER_LOADING', os.getenv('FLASK_DEBUG', 'false')).lower() == 'true'
+
+# Count SQL statements per request and warn when an endpoint exceeds its budget (dev/test only)
+QUERY_COUNT_CHECKS = os.getenv('QUERY_COUNT_CHECKS', os.getenv('FLASK_DEBUG', 'false')).lower() == 'true'
+
+# Statement budget for endpoints without an entry in QUERY_COUNT_LIMITS
+DEFAULT_QUERY_COUNT_LIMIT = int(os.getenv('DEFAULT_QUERY_COUNT_LIMIT', 5))
+
+# Per-endpoint statement budgets, keyed by Flask endpoint name
+QUERY_COUNT_LIMITS = {
+    'prompt_list': 2,
+    'prompt': 3,
+    'prompt_activate': 1,
+    'prompt_by_name': 1,
+}
+
+# Serve attribute similarity search from an in-process embedding matrix instead of pgvector
+# (every process holds a full copy of the embeddings, so this is opt-in)
+IN_MEMORY_ATTRIBUTE_SEARCH = os.getenv('IN_MEMORY_ATTRIBUTE_SEARCH', 'false').lower() == 'true'
+
+# Minimum seconds between checks of attribute_version for other processes' writes
+ATTRIBUTE_INDEX_CHECK_INTERVAL = float(os.getenv('ATTRIBUTE_INDEX_CHECK_INTERVAL', 5))
+
+# Store the in-process attribute index as int8 codes (4x less memory, slightly lower precision)
+ATTRIBUTE_INDEX_QUANTIZE = os.getenv('ATTRIBUTE_INDEX_QUANTIZE', 'false').lower() == 'true'
+
+# Seconds between batch recomputes of attribute.exp_count from experience links
+EXP_COUNT_REFRESH_INTERVAL = int(os.getenv('EXP_COUNT_REFRESH_INTERVAL', 300))
+
+# Seconds an LLM term extraction is reused for a repeated search text
+SEARCH_EXTRACTION_CACHE_TIMEOUT = int(os.getenv('SEARCH_EXTRACTION_CACHE_TIMEOUT', 3600))
+
+# Seconds a search term's nearest-attribute match is reused (bounds staleness after other processes' attribute writes)
+SEARCH_MATCH_CACHE_TIMEOUT = int(os.getenv('SEARCH_MATCH_CACHE_TIMEOUT', 300))
+
+# Highest-scoring matching experiences returned per expert in search results
+MAX_MATCHING_EXPERIENCES_PER_EXPERT = int(os.getenv('MAX_MATCHING_EXPERIENCES_PER_EXPERT', 20))
+
 SEARCHABLE_ATTRIBUTE_TYPES = ["agency", "role", "seniority", "skill", "program"]
 
 # Minimum similarity threshold for database attribute matching
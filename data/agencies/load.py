@@ -3,20 +3,27 @@
 Load agencies from agencies.csv into the database as attributes of type 'agency' with taxonomy structure
 """
 
-import csv
 import sys
 import os
 from pathlib import Path
+from itertools import groupby
 from typing import Dict, Optional
 
 # Add project root to path to import modules
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
 from database import get_db_session
 from models import Attribute
 from lib.embedding_service import embedding_service
 
+# Agencies embedded per API call; a taxonomy level can hold over a thousand
+EMBEDDING_BATCH_SIZE = 500
+
 
 def load_agencies_from_csv():
     """Load agencies from CSV and create attributes of type 'agency' with proper taxonomy"""
@@ -29,109 +36,146 @@ def load_agencies_from_csv():
     session = get_db_session()
     
     try:
-        # Keep track of created agencies by their full hierarchy path
+        # Keep track of created agencies (Attribute instances or inserted rows) by their full hierarchy path
         agency_cache: Dict[str, Attribute] = {}
         agencies_loaded = 0
         agencies_skipped = 0
         
         # First pass: collect all agencies to understand the hierarchy
-        agencies_data = []
-        with open(csv_path, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                canonical_name = row['canonical_name'].strip()
-                hierarchy_path = row['hierarchy_path'].strip()
-                level = int(row['level']) if row['level'].strip() else 1
-                
-                if not canonical_name:
-                    continue
-                    
-                agencies_data.append({
-                    'name': canonical_name,
-                    'hierarchy_path': hierarchy_path,
-                    'level': level
-                })
+        # Parse and trim the three columns we use column-wise rather than row by row
+        df = pd.read_csv(csv_path, usecols=['canonical_name', 'hierarchy_path', 'level'],
+                         dtype=str, keep_default_na=False, encoding='utf-8')
+        df = df.apply(lambda column: column.str.strip())
+        df = df[df['canonical_name'] != '']
+        levels = df['level'].replace('', '1').astype(int)
+        
+        agencies_data = [
+            {
+                'name': canonical_name,
+                'hierarchy_path': hierarchy_path,
+                'level': level
+            } for canonical_name, hierarchy_path, level in zip(
+                df['canonical_name'].tolist(), df['hierarchy_path'].tolist(), levels.tolist()
+            )
+        ]
         
         # Sort by level to ensure parents are created before children
         agencies_data.sort(key=lambda x: x['level'])
         
         print(f"Found {len(agencies_data)} agencies to process")
         
-        for agency_data in agencies_data:
-            canonical_name = agency_data['name']
-            hierarchy_path = agency_data['hierarchy_path']
-            level = agency_data['level']
-            
-            # Check if this agency already exists
-            existing = session.query(Attribute).filter_by(
-                type="agency",
-                name=canonical_name
-            ).first()
-            
-            if existing:
-                print(f"Skipping existing agency: {canonical_name}")
-                agencies_skipped += 1
-                # Important: Cache the existing item so it can be found as a parent
-                agency_cache[hierarchy_path] = existing
-                continue
-            
-            # Parse hierarchy to find parent
-            parent_attr = None
-            depth = level - 1  # Convert level (1,2,3) to depth (0,1,2)
+        # Load every existing agency in one query instead of looking each one and
+        # each parent up separately; inserted agencies are added as we go
+        agencies_by_name = {
+            row.name: row for row in session.execute(
+                select(Attribute.id, Attribute.name, Attribute.depth, Attribute.parent_id)
+                .where(Attribute.type == "agency")
+            )
+        }
+        
+        # Insert one taxonomy level per statement; parents are inserted a level
+        # earlier, so their ids are known when their children are built
+        for level, level_agencies in groupby(agencies_data, key=lambda x: x['level']):
+            new_agencies = []
             
-            if hierarchy_path and '>' in hierarchy_path and depth > 0:
-                # Split hierarchy path to find parent
-                path_parts = hierarchy_path.split('>')
-                if len(path_parts) >= 2:
-                    # Parent is the second-to-last part in the hierarchy
-                    parent_name = path_parts[-2].strip()
-                    
-                    # Look for parent in cache first
-                    parent_path = '>'.join(path_parts[:-1])
-                    parent_attr = agency_cache.get(parent_path)
-                    
-                    if not parent_attr:
-                        # Try to find parent by name in database
-                        parent_attr = session.query(Attribute).filter_by(
-                            type="agency",
-                            name=parent_name
-                        ).first()
+            for agency_data in level_agencies:
+                canonical_name = agency_data['name']
+                hierarchy_path = agency_data['hierarchy_path']
+                
+                # Check if this agency already exists
+                existing = agencies_by_name.get(canonical_name)
+                
+                if existing:
+                    print(f"Skipping existing agency: {canonical_name}")
+                    agencies_skipped += 1
+                    # Important: Cache the existing item so it can be found as a parent
+                    agency_cache[hierarchy_path] = existing
+                    continue
+                
+                # Parse hierarchy to find parent
+                parent_attr = None
+                depth = level - 1  # Convert level (1,2,3) to depth (0,1,2)
+                
+                if hierarchy_path and '>' in hierarchy_path and depth > 0:
+                    # Split hierarchy path to find parent
+                    path_parts = hierarchy_path.split('>')
+                    if len(path_parts) >= 2:
+                        # Parent is the second-to-last part in the hierarchy
+                        parent_name = path_parts[-2].strip()
                         
-                        # If we found the parent in DB, add it to cache for future lookups
-                        if parent_attr:
-                            agency_cache[parent_path] = parent_attr
-                    
-                    # Log if parent not found (this might indicate data issues)
-                    if not parent_attr:
-                        print(f"Warning: Parent '{parent_name}' not found for '{canonical_name}'")
-            
-            # Create the agency attribute
-            # Parse hierarchy path into array for summary
-            path_array = hierarchy_path.split('>') if hierarchy_path else [canonical_name]
-            formatted_summary = ' > '.join(path_array)  # Use " > " for better readability
+                        # Look for parent in cache first
+                        parent_path = '>'.join(path_parts[:-1])
+                        parent_attr = agency_cache.get(parent_path)
+                        
+                        if not parent_attr:
+                            # Try to find parent by name among all agencies
+                            parent_attr = agencies_by_name.get(parent_name)
+                            
+                            # If we found the parent in DB, add it to cache for future lookups
+                            if parent_attr:
+                                agency_cache[parent_path] = parent_attr
+                        
+                        # Log if parent not found (this might indicate data issues)
+                        if not parent_attr:
+                            print(f"Warning: Parent '{parent_name}' not found for '{canonical_name}'")
+                
+                # Create the agency attribute
+                # Parse hierarchy path into array for summary
+                path_array = hierarchy_path.split('>') if hierarchy_path else [canonical_name]
+                formatted_summary = ' > '.join(path_array)  # Use " > " for better readability
+                
+                # For embedding generation, combine canonical name with full taxonomy path
+                # This gives the embedding model both the specific name and hierarchical context
+                embedding_text = f"{canonical_name}: {formatted_summary}" if hierarchy_path else canonical_name
+                
+                new_agencies.append({
+                    'name': canonical_name,
+                    'type': "agency",
+                    'summary': embedding_text,  # This will be used for embedding generation
+                    'parent_id': parent_attr.id if parent_attr else None,
+                    'depth': depth,
+                    'hierarchy_path': hierarchy_path
+                })
             
-            # For embedding generation, combine canonical name with full taxonomy path
-            # This gives the embedding model both the specific name and hierarchical context
-            embedding_text = f"{canonical_name}: {formatted_summary}" if hierarchy_path else canonical_name
+            if not new_agencies:
+                continue
             
-            agency_attr = Attribute(
-                name=canonical_name,
-                type="agency",
-                summary=embedding_text,  # This will be used for embedding generation
-                parent_id=parent_attr.id if parent_attr else None,
-                depth=depth
-            )
+            # Core inserts bypass the before_insert hook, so embed the whole level
+            # here, EMBEDDING_BATCH_SIZE agencies per API call; a failed batch
+            # falls back to per-agency calls rather than aborting the load
+            embeddings = []
+            for start in range(0, len(new_agencies), EMBEDDING_BATCH_SIZE):
+                embeddings.extend(embedding_service.generate_attribute_embeddings_or_none([
+                    (agency['name'], "agency", agency['summary'])
+                    for agency in new_agencies[start:start + EMBEDDING_BATCH_SIZE]
+                ]))
             
-            session.add(agency_attr)
-            agency_cache[hierarchy_path] = agency_attr
-            agencies_loaded += 1
+            # Single INSERT ... ON CONFLICT DO NOTHING against the unique (type, name)
+            # index, so agencies added concurrently since the lookup are skipped
+            inserted = session.execute(
+                pg_insert(Attribute).values([
+                    {
+                        **{key: value for key, value in agency.items() if key != 'hierarchy_path'},
+                        'embedding': embedding
+                    } for agency, embedding in zip(new_agencies, embeddings)
+                ]).on_conflict_do_nothing(
+                    index_elements=['type', 'name']
+                ).returning(Attribute.id, Attribute.name, Attribute.depth, Attribute.parent_id)
+            ).all()
             
-            print(f"Added: {canonical_name} (depth: {depth}, parent: {parent_attr.name if parent_attr else 'None'})")
+            inserted_by_name = {row.name: row for row in inserted}
+            agencies_by_name.update(inserted_by_name)
+            parent_names = {agency.id: agency.name for agency in agency_cache.values()}
+            for agency in new_agencies:
+                row = inserted_by_name.get(agency['name'])
+                if row is None:
+                    agencies_skipped += 1
+                    continue
+                agency_cache[agency['hierarchy_path']] = row
+                print(f"Added: {row.name} (depth: {row.depth}, parent: {parent_names.get(row.parent_id, 'None')})")
             
-            # Commit every 50 records to avoid losing work
-            if agencies_loaded % 50 == 0:
-                session.commit()
-                print(f"Committed {agencies_loaded} agencies...")
+            agencies_loaded += len(inserted)
+            print(f"Inserted {len(inserted)} level {level} agencies...")
         
         # Final commit
         session.commit()
@@ -26,9 +26,11 @@ from datetime import datetime
 # Add the project root to Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
 
-from models import Expert, Experience, Attribute
+from models import Expert, Experience, Attribute, experience_attribute_association, EXPERT_PROFILE_ID
 from lib.llm_extractor import LLMExtractor
-from database import get_db_session
+from database import get_db_session, refresh_attribute_exp_counts
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 
 class ExpertLoader:
@@ -79,7 +81,7 @@ class ExpertLoader:
             # Check if expert already exists (by profile_id in meta)
             if not self.dry_run:
                 existing = self.session.query(Expert).filter(
-                    Expert.meta.op('->>')('profile_id') == profile_id
+                    EXPERT_PROFILE_ID == profile_id
                 ).first()
                 
                 if existing:
@@ -117,15 +119,25 @@ class ExpertLoader:
                 return True
             
             # Create expert record
-            expert = Expert(
-                name=expert_data.get('name')[:30],  # Truncate to fit field limit
-                summary=expert_data.get('summary', ''),
-                status=True,
-                meta=meta
+            # INSERT ... ON CONFLICT DO NOTHING on the unique profile_id index so a
+            # concurrent run that created this profile first is skipped, not duplicated
+            expert_id = self.session.scalar(
+                pg_insert(Expert).values(
+                    name=expert_data.get('name')[:30],  # Truncate to fit field limit
+                    summary=expert_data.get('summary', ''),
+                    status=True,
+                    meta=meta
+                ).on_conflict_do_nothing(
+                    index_elements=[EXPERT_PROFILE_ID],
+                    index_where=EXPERT_PROFILE_ID.isnot(None)
+                ).returning(Expert.id)
             )
             
-            self.session.add(expert)
-            self.session.flush()  # Get expert ID without committing
+            if expert_id is None:
+                self.session.rollback()
+                self.log(f"Skipping {profile_id}: expert was created concurrently", 'INFO')
+                self.stats['skipped'] += 1
+                return False
             
             # Create experiences and attributes
             created_experiences = 0
@@ -146,7 +158,7 @@ class ExpertLoader:
                         end_date = datetime.fromisoformat(end_date_str).date()
                     
                     experience = Experience(
-                        expert_id=expert.id,
+                        expert_id=expert_id,
                         employer=exp_data.get('employer'),
                         position=exp_data.get('position'),
                         start_date=start_date,
@@ -159,20 +171,26 @@ class ExpertLoader:
                     
                     # Associate only existing attributes using IDs from two-step extraction
                     matched_attributes = 0
-                    attribute_ids = exp_data.get('attribute_ids', [])
+                    attribute_ids = list(dict.fromkeys(exp_data.get('attribute_ids', [])))
+                    existing_ids = set()
+                    if attribute_ids:
+                        existing_ids = set(self.session.scalars(
+                            select(Attribute.id).where(Attribute.id.in_(attribute_ids))
+                        ))
                     
+                    association_rows = []
                     for attr_id in attribute_ids:
-                        # Get attribute from database by ID
-                        attribute = self.session.query(Attribute).filter(Attribute.id == attr_id).first()
-                        
-                        if attribute:
-                            # Associate existing database attribute with this experience
-                            if experience not in attribute.experiences:
-                                attribute.experiences.append(experience)
+                        if attr_id in existing_ids:
+                            # Insert the link row directly instead of appending to
+                            # attribute.experiences, which loads the whole collection
+                            association_rows.append({'experience_id': experience.id, 'attribute_id': attr_id})
                             matched_attributes += 1
                         else:
                             self.log(f"Warning: Attribute ID {attr_id} not found in database for {profile_id}", 'WARN')
                     
+                    if association_rows:
+                        self.session.execute(experience_attribute_association.insert(), association_rows)
+                    
                     self.log(f"  Matched {matched_attributes} existing attributes for experience: {exp_data.get('position', 'Unknown')} at {exp_data.get('employer', 'Unknown')}")
                     
                     created_experiences += 1
@@ -184,7 +202,7 @@ class ExpertLoader:
             # Commit less frequently for better performance
             self.session.commit()
             
-            self.log(f"Success {profile_id}: Created expert '{expert_data.get('name')}' (ID: {expert.id}) with {created_experiences} experiences in {extraction_time:.2f}s")
+            self.log(f"Success {profile_id}: Created expert '{expert_data.get('name')}' (ID: {expert_id}) with {created_experiences} experiences in {extraction_time:.2f}s")
             self.stats['successful'] += 1
             return True
             
@@ -233,6 +251,10 @@ class ExpertLoader:
         # Process remaining batch
         if batch:
             self.process_batch(batch)
+        
+        # Link counts aren't maintained per insert; bring them up to date once per run
+        if not self.dry_run:
+            self.log(f"Refreshed exp_count for {refresh_attribute_exp_counts()} attributes")
             
         self.print_final_stats()
         
@@ -13,6 +13,9 @@ from typing import Dict, Optional
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
 from database import get_db_session
 from models import Attribute
 from lib.embedding_service import embedding_service
@@ -52,43 +55,59 @@ def load_roles_from_csv():
         
         print(f"Found {len(roles_data)} roles to process")
         
+        # Look up all existing role names in one query to avoid embedding them again
+        existing_names = set(session.scalars(
+            select(Attribute.name).where(
+                Attribute.type == "role",
+                Attribute.name.in_([role_data['name'] for role_data in roles_data])
+            )
+        ))
+        
+        # First pass: skip existing roles and collect the new ones
+        new_roles = []
         for role_data in roles_data:
             name = role_data['name']
-            depth = role_data['depth']
-            summary = role_data['summary']
-            
-            # Check if this role already exists
-            existing = session.query(Attribute).filter_by(
-                type="role",
-                name=name
-            ).first()
             
-            if existing:
+            if name in existing_names:
                 print(f"Skipping existing role: {name}")
                 roles_skipped += 1
                 continue
             
-            # Create the role attribute
             # For embedding generation, combine name with summary for better context
-            embedding_text = f"{name}: {summary}" if summary else name
-            
-            role_attr = Attribute(
-                name=name,
-                type="role",
-                summary=embedding_text,  # This will be used for embedding generation
-                parent_id=None,  # Roles are flat, no hierarchy
-                depth=depth
-            )
+            summary = role_data['summary']
+            role_data['embedding_text'] = f"{name}: {summary}" if summary else name
+            new_roles.append(role_data)
+        
+        if new_roles:
+            # Generate embeddings for all new roles in a single API call instead of
+            # one call per row from the before_insert hook; a failed batch falls
+            # back to per-role calls and roles that still fail load without one
+            embeddings = embedding_service.generate_attribute_embeddings_or_none([
+                (role_data['name'], "role", role_data['embedding_text']) for role_data in new_roles
+            ])
             
-            session.add(role_attr)
-            roles_loaded += 1
+            # Single INSERT ... ON CONFLICT DO NOTHING against the unique (type, name)
+            # index, so roles added concurrently since the lookup are skipped
+            inserted = session.execute(
+                pg_insert(Attribute).values([
+                    {
+                        'name': role_data['name'],
+                        'type': "role",
+                        'summary': role_data['embedding_text'],  # This will be used for embedding generation
+                        'parent_id': None,  # Roles are flat, no hierarchy
+                        'depth': role_data['depth'],
+                        'embedding': embedding
+                    } for role_data, embedding in zip(new_roles, embeddings)
+                ]).on_conflict_do_nothing(
+                    index_elements=['type', 'name']
+                ).returning(Attribute.name, Attribute.depth)
+            ).all()
             
-            print(f"Added: {name} (depth: {depth})")
+            for row in inserted:
+                print(f"Added: {row.name} (depth: {row.depth})")
             
-            # Commit every 50 records to avoid losing work
-            if roles_loaded % 50 == 0:
-                session.commit()
-                print(f"Committed {roles_loaded} roles...")
+            roles_loaded = len(inserted)
+            roles_skipped += len(new_roles) - roles_loaded
         
         # Final commit
         session.commit()
@@ -1,5 +1,9 @@
+import io
+import logging
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event, exc, text
 from sqlalchemy.orm import sessionmaker
 from models import Base
 
@@ -9,10 +13,149 @@ DATABASE_URL = os.getenv('DATABASE_URL')
 if not DATABASE_URL:
     raise RuntimeError('DATABASE_URL environment variable is not set. Please configure it (see .env.example).')
 
-# Single database engine and session factory for the entire app
-engine = create_engine(DATABASE_URL, echo=True)
+logger = logging.getLogger(__name__)
+
+# Connections kept open per process, extra connections allowed under bursts, and
+# the age in seconds after which a pooled connection is replaced on checkout
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 20))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+
+# Log every SQL statement (debugging only; formats and writes each statement)
+DB_ECHO = os.getenv('DB_ECHO', 'false').lower() == 'true'
+
+# Pooled connections idle at least this many seconds are pinged on checkout;
+# connections returned more recently are handed out without the extra round trip
+DB_PING_IDLE_SECONDS = int(os.getenv('DB_PING_IDLE_SECONDS', 30))
+
+# Single database engine and session factory for the entire app. The built-in
+# pre-ping is replaced by _ping_idle_connection below, which skips busy connections
+engine = create_engine(
+    DATABASE_URL,
+    echo=DB_ECHO,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=False
+)
 SessionLocal = sessionmaker(bind=engine)
 
 def get_db_session():
     """Get a database session with proper cleanup"""
     return SessionLocal()
+
+# Autocommit view of the same engine and pool for pure reads: skips the
+# BEGIN/ROLLBACK round trips a session would issue
+readonly_engine = engine.execution_options(isolation_level='AUTOCOMMIT')
+
+def get_readonly_connection():
+    """Get an autocommit connection for read-only queries; use as a context manager"""
+    return readonly_engine.connect()
+
+def copy_int_rows(session, table: str, columns, rows):
+    """
+    Bulk-insert rows of integers with COPY FROM STDIN on the session's connection
+
+    Runs inside the session's transaction. Values are passed through int(), so
+    the COPY stream can't be corrupted by request data.
+    """
+    buffer = io.StringIO(''.join('\t'.join(str(int(value)) for value in row) + '\n' for row in rows))
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+    finally:
+        cursor.close()
+
+@event.listens_for(engine, 'checkin')
+def _record_checkin(dbapi_connection, connection_record):
+    connection_record.info['checked_in_at'] = time.monotonic()
+
+@event.listens_for(engine, 'checkout')
+def _ping_idle_connection(dbapi_connection, connection_record, connection_proxy):
+    """Validate a connection that sat idle in the pool; a failure replaces only that connection"""
+    checked_in_at = connection_record.info.get('checked_in_at')
+    if checked_in_at is None or time.monotonic() - checked_in_at < DB_PING_IDLE_SECONDS:
+        return
+    try:
+        engine.dialect.do_ping(dbapi_connection)
+    except Exception as e:
+        # The pool invalidates this connection and retries the checkout with a new one
+        logger.warning("Discarding dead pooled connection: %s", e)
+        raise exc.DisconnectionError() from e
+
+# Attributes whose stored exp_count differs from their number of experience links
+STALE_EXP_COUNTS_QUERY = text("""
+    SELECT a.id, COALESCE(c.cnt, 0) AS cnt
+    FROM attribute a
+    LEFT JOIN (
+        SELECT attribute_id, count(*) AS cnt FROM experience_attribute GROUP BY attribute_id
+    ) c ON c.attribute_id = a.id
+    WHERE a.exp_count <> COALESCE(c.cnt, 0)
+""")
+
+SET_EXP_COUNTS = text("""
+    UPDATE attribute a
+    SET exp_count = u.cnt
+    FROM unnest(CAST(:ids AS int[]), CAST(:counts AS int[])) AS u(id, cnt)
+    WHERE a.id = u.id
+""")
+
+# Session-level lock held across all of a refresh's transactions, so only one
+# process recomputes at a time; the others skip that round
+EXP_COUNT_REFRESH_LOCK = text("SELECT pg_try_advisory_lock(hashtext('attribute_exp_count_refresh'))")
+EXP_COUNT_REFRESH_UNLOCK = text("SELECT pg_advisory_unlock(hashtext('attribute_exp_count_refresh'))")
+
+# Attribute rows written per transaction by refresh_attribute_exp_counts
+EXP_COUNT_BATCH_SIZE = 1000
+
+def refresh_attribute_exp_counts(batch_size: int = EXP_COUNT_BATCH_SIZE) -> int:
+    """
+    Recompute attribute.exp_count from experience_attribute
+
+    Replaces per-statement triggers, which locked every linked attribute row
+    for the duration of each link-writing transaction. Only changed rows are
+    written, in short transactions of batch_size rows.
+
+    Returns:
+        Number of attributes updated, or 0 if another process holds the refresh lock
+    """
+    with engine.connect() as connection:
+        with connection.begin():
+            if not connection.scalar(EXP_COUNT_REFRESH_LOCK):
+                return 0
+        try:
+            with connection.begin():
+                stale = connection.execute(STALE_EXP_COUNTS_QUERY).all()
+            for start in range(0, len(stale), batch_size):
+                batch = stale[start:start + batch_size]
+                with connection.begin():
+                    connection.execute(SET_EXP_COUNTS, {
+                        'ids': [row.id for row in batch],
+                        'counts': [row.cnt for row in batch]
+                    })
+        finally:
+            try:
+                with connection.begin():
+                    connection.execute(EXP_COUNT_REFRESH_UNLOCK)
+            except Exception as e:
+                # Rollback on check-in doesn't release session locks; discarding
+                # the connection does, so the pool never hands out a locked one
+                logger.warning("Releasing exp_count refresh lock failed, discarding connection: %s", e)
+                connection.invalidate()
+    return len(stale)
+
+def _refresh_exp_counts(interval: int):
+    while True:
+        time.sleep(interval)
+        try:
+            updated = refresh_attribute_exp_counts()
+            if updated:
+                logger.info("Refreshed exp_count for %d attributes", updated)
+        except Exception as e:
+            logger.warning("Attribute exp_count refresh failed: %s", e)
+
+def start_exp_count_refresh(interval: int = 300):
+    """Start a daemon thread that runs refresh_attribute_exp_counts every interval seconds"""
+    thread = threading.Thread(target=_refresh_exp_counts, args=(interval,), name='exp-count-refresh', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,15 @@
+from datetime import date, datetime
+
+
+def parse_date(value: str) -> date:
+    """
+    Parse an ISO date, also accepting full ISO timestamps (the time part is dropped)
+
+    Raises:
+        ValueError: If the value is neither an ISO date nor an ISO timestamp
+    """
+    # date.fromisoformat parses straight into a date; full timestamps are still accepted
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return datetime.fromisoformat(value).date()
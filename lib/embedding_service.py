@@ -1,10 +1,15 @@
+import logging
 import openai
 import os
 import numpy as np
+import threading
+from collections import OrderedDict
 from typing import List, Optional, Tuple
 import settings
 from config import OPENAI_API_KEY
 
+logger = logging.getLogger(__name__)
+
 class EmbeddingService:
     def __init__(self):
         # Try config first, fall back to environment variable
@@ -13,6 +18,10 @@ class EmbeddingService:
         # Using OpenAI's latest text embedding model
         self.model = "text-embedding-3-small"  # More cost-effective, good performance
         # Alternative: "text-embedding-3-large" for higher quality but more expensive
+        # In-process LRU of search query embeddings, keyed by normalized query text
+        self._query_cache: OrderedDict = OrderedDict()
+        self._query_cache_size = 1024
+        self._query_cache_lock = threading.Lock()
     
     def generate_embedding(self, text: str) -> List[float]:
         """
@@ -33,6 +42,52 @@ class EmbeddingService:
         except Exception as e:
             raise Exception(f"Failed to generate embedding: {str(e)}")
     
+    def generate_query_embedding(self, text: str) -> List[float]:
+        """
+        Generate an embedding for a search query, reusing the result for repeated queries
+        
+        Queries are normalized (lowercased, whitespace collapsed) before lookup,
+        so trivially different spellings of the same query share one API call.
+        
+        Args:
+            text: The search query
+            
+        Returns:
+            List of floats representing the embedding vector
+        """
+        return self.generate_query_embeddings([text])[0]
+    
+    def generate_query_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for several search queries, embedding all cache misses in one API call
+        
+        Args:
+            texts: The search queries
+            
+        Returns:
+            List of embedding vectors in the same order as input texts
+        """
+        keys = [' '.join(text.lower().split()) for text in texts]
+        with self._query_cache_lock:
+            found = {}
+            for key in keys:
+                if key in self._query_cache:
+                    self._query_cache.move_to_end(key)
+                    found[key] = self._query_cache[key]
+        
+        misses = [key for key in dict.fromkeys(keys) if key not in found]
+        if misses:
+            # Failures propagate and are not cached
+            embeddings = self.generate_batch_embeddings(misses)
+            with self._query_cache_lock:
+                for key, embedding in zip(misses, embeddings):
+                    # Tuples keep cached vectors immutable
+                    found[key] = self._query_cache[key] = tuple(embedding)
+                while len(self._query_cache) > self._query_cache_size:
+                    self._query_cache.popitem(last=False)
+        
+        return [list(found[key]) for key in keys]
+    
     def generate_batch_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
         Generate embeddings for multiple texts in a single API call
@@ -69,10 +124,54 @@ class EmbeddingService:
         Returns:
             List of floats representing the embedding vector
         """
+        return self.generate_embedding(self._attribute_text(name, type_str, summary))
+
+    def generate_attribute_embeddings_batch(self, attributes: List[Tuple[str, str, str]]) -> List[List[float]]:
+        """
+        Generate embeddings for multiple attributes in a single API call
+
+        Args:
+            attributes: List of (name, type, summary) tuples
+
+        Returns:
+            List of embedding vectors aligned by index with the input attributes
+        """
+        texts = [self._attribute_text(name, type_str, summary) for name, type_str, summary in attributes]
+        return self.generate_batch_embeddings(texts)
+
+    def generate_attribute_embeddings_or_none(self, attributes: List[Tuple[str, str, str]]) -> List[Optional[List[float]]]:
+        """
+        Generate embeddings for multiple attributes, never failing the whole list
+
+        Tries a single batch call first and falls back to one call per attribute
+        if it fails. Attributes that still fail get None, the same policy as
+        the model's before_insert hook.
+
+        Args:
+            attributes: List of (name, type, summary) tuples
+
+        Returns:
+            List of embedding vectors (or None) aligned by index with the input attributes
+        """
+        try:
+            return self.generate_attribute_embeddings_batch(attributes)
+        except Exception as e:
+            logger.warning("Batch embedding failed, retrying per attribute: %s", e)
+
+        embeddings = []
+        for name, type_str, summary in attributes:
+            try:
+                embeddings.append(self.generate_attribute_embedding(name, type_str, summary))
+            except Exception as e:
+                logger.warning("Failed to generate embedding for attribute %s: %s", name, e)
+                embeddings.append(None)
+        return embeddings
+
+    @staticmethod
+    def _attribute_text(name: str, type_str: str, summary: str) -> str:
         # Combine attribute information into a meaningful text for embedding
-        combined_text = f"{type_str}: {name} - {summary}"
-        return self.generate_embedding(combined_text)
-    
+        return f"{type_str}: {name} - {summary}"
+
     def cosine_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
         """
         Calculate cosine similarity between two embeddings
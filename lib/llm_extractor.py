@@ -1,11 +1,15 @@
+import logging
 import openai
 import os
 from typing import Dict, Any, Optional, List, Callable
 import json
 from pathlib import Path
 import requests
+import threading
 from config import SEARCHABLE_ATTRIBUTE_TYPES, OPENAI_API_KEY
 
+logger = logging.getLogger(__name__)
+
 class LLMExtractor:
     def __init__(self, templates_dir: str = "promptTemplates", api_base_url: str = None):
         # Try config first, fall back to environment variable
@@ -13,6 +17,17 @@ class LLMExtractor:
         self.client = openai.OpenAI(api_key=api_key)
         self.templates_dir = Path(templates_dir)
         self.api_base_url = api_base_url or os.getenv('API_BASE_URL', 'http://127.0.0.1:5001')
+        # Per-thread sessions: requests.Session isn't thread-safe, and this
+        # instance is shared by every request-handling thread
+        self._local = threading.local()
+
+    @property
+    def http(self) -> requests.Session:
+        """This thread's persistent session, so template and attribute lookups reuse keep-alive connections"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
         
     def load_template(self, template_name: str) -> Dict[str, Any]:
         """
@@ -26,14 +41,14 @@ class LLMExtractor:
         """
         try:
             url = f"{self.api_base_url}/api/prompts/by-name/{template_name}"
-            response = requests.get(url, timeout=10)
+            response = self.http.get(url, timeout=10)
             response.raise_for_status()
             
             return response.json()
             
         except requests.RequestException as e:
             # Fallback to file-based templates if API fails
-            print(f"Warning: Failed to load template from database, falling back to files: {str(e)}")
+            logger.warning("Failed to load template from database, falling back to files: %s", e)
             template_path = self.templates_dir / f"{template_name}.json"
             if not template_path.exists():
                 raise FileNotFoundError(f"Template not found in database or files: {template_name}")
@@ -57,31 +72,29 @@ class LLMExtractor:
         try:
             url = f"{self.api_base_url}/api/attributes"
             
-            # Try to find existing attribute with exact name and type
+            # Exact case-insensitive name match on the indexed name_lower column
             params = {
                 'type': attribute_type,
-                'q': attribute_name,
-                'limit': 50  # Get more results to find exact matches
+                'name': attribute_name,
+                'limit': 1
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.http.get(url, params=params, timeout=10)
             response.raise_for_status()
             
             existing_attributes = response.json().get('attributes', [])
             
-            # Look for exact match (case-insensitive)
-            for attr in existing_attributes:
-                if (attr.get('name', '').lower() == attribute_name.lower() and 
-                    attr.get('type', '').lower() == attribute_type.lower()):
-                    print(f"DEBUG - Found existing {attribute_type}: {attribute_name} (ID: {attr['id']})")
-                    return attr
+            if existing_attributes:
+                attr = existing_attributes[0]
+                logger.debug("Found existing %s: %s (ID: %s)", attribute_type, attribute_name, attr['id'])
+                return attr
             
             # No exact match found - return empty dict
-            print(f"DEBUG - No existing {attribute_type} found for: {attribute_name}")
+            logger.debug("No existing %s found for: %s", attribute_type, attribute_name)
             return {}
             
         except Exception as e:
-            print(f"Warning: Failed to get attribute '{attribute_name}' ({attribute_type}): {str(e)}")
+            logger.warning("Failed to get attribute '%s' (%s): %s", attribute_name, attribute_type, e)
             return {}
 
     def search_attributes(self, attribute_type: str, search_query: str, limit: int = 10) -> List[Dict[str, Any]]:
@@ -104,14 +117,14 @@ class LLMExtractor:
                 'limit': limit
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.http.get(url, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
             return data.get('attributes', [])
             
         except Exception as e:
-            print(f"Warning: Failed to search attributes: {str(e)}")
+            logger.warning("Failed to search attributes: %s", e)
             return []
     
     def extract_structured_data(
@@ -293,7 +306,7 @@ class LLMExtractor:
         template_enable_search = metadata.get("enable_attribute_search") or template.get("enable_attribute_search", False)
         use_attribute_search = enable_attribute_search or template_enable_search
         
-        print(f"DEBUG - Using template: {template_name}, model: {model}, enable_search: {use_attribute_search}")
+        logger.debug("Using template: %s, model: %s, enable_search: %s", template_name, model, use_attribute_search)
 
         out = self.extract_structured_data(
             system_prompt=template["system_prompt"],
@@ -305,7 +318,7 @@ class LLMExtractor:
             enable_attribute_search=use_attribute_search
         )
         
-        print(out)
+        logger.debug("Template %s output: %s", template_name, out)
         return out
     
     def extract_expert_structured(self, text: str) -> Dict[str, Any]:
@@ -355,11 +368,11 @@ class LLMExtractor:
         import time
         
         # Step 1: Extract structured expert and experience data (single LLM call)
-        print("Step 1: Extracting structured expert data...")
+        logger.debug("Step 1: Extracting structured expert data...")
         start_time = time.time()
         structured_data = self.extract_expert_structured(text)
         extraction_time = time.time() - start_time
-        print(f"Extraction completed in {extraction_time:.2f}s")
+        logger.debug("Extraction completed in %.2fs", extraction_time)
         
         experiences = structured_data.get("experiences", [])
         if not experiences:
@@ -369,7 +382,7 @@ class LLMExtractor:
             }
         
         # Step 2: Use intelligent LLM-guided tool calling for attribute matching
-        print(f"Step 2: Analyzing attributes for {len(experiences)} experiences with LLM guidance...")
+        logger.debug("Step 2: Analyzing attributes for %d experiences with LLM guidance...", len(experiences))
         analysis_start = time.time()
         
         try:
@@ -377,8 +390,8 @@ class LLMExtractor:
             experiences_with_attributes = self.analyze_experiences_with_tools(experiences)
             
             analysis_time = time.time() - analysis_start
-            print(f"LLM-guided attribute analysis completed in {analysis_time:.2f}s")
-            print(f"Total extraction time: {extraction_time + analysis_time:.2f}s")
+            logger.debug("LLM-guided attribute analysis completed in %.2fs", analysis_time)
+            logger.info("Total extraction time: %.2fs", extraction_time + analysis_time)
             
             return {
                 "expert": structured_data.get("expert", {}),
@@ -386,7 +399,7 @@ class LLMExtractor:
             }
             
         except Exception as e:
-            print(f"Warning: Tool-based analysis failed, falling back to basic processing: {str(e)}")
+            logger.warning("Tool-based analysis failed, falling back to basic processing: %s", e)
             return self.extract_expert_with_attributes_fallback(structured_data, extraction_time)
     
     def analyze_experiences_with_tools(self, experiences: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -478,9 +491,9 @@ IMPORTANT:
             }
             experiences_with_attributes.append(exp_with_attrs)
             
-            print(f"  Experience {exp_index}: {len(analysis.get('attribute_ids', []))} attributes matched")
+            logger.debug("  Experience %d: %d attributes matched", exp_index, len(analysis.get('attribute_ids', [])))
             if analysis.get("search_notes"):
-                print(f"    Search notes: {analysis.get('search_notes')}")
+                logger.debug("    Search notes: %s", analysis.get('search_notes'))
         
         return experiences_with_attributes
     
@@ -489,19 +502,18 @@ IMPORTANT:
         Match attributes using the existing search API - optimized for speed and accuracy
         """
         from config import SEARCHABLE_ATTRIBUTE_TYPES
-        import requests
         
         experiences_with_attributes = []
         
         for i, experience in enumerate(experiences):
-            print(f"  Processing experience {i+1}/{len(experiences)}: {experience.get('position', 'Unknown')} at {experience.get('employer', 'Unknown')}")
+            logger.debug("  Processing experience %d/%d: %s at %s", i + 1, len(experiences), experience.get('position', 'Unknown'), experience.get('employer', 'Unknown'))
             
             matched_attribute_ids = []
             
             # Agency search - use employer only, be specific
             if experience.get('employer'):
                 try:
-                    response = requests.get(
+                    response = self.http.get(
                         f"{self.api_base_url}/api/attributes",
                         params={
                             'type': 'agency',
@@ -519,15 +531,15 @@ IMPORTANT:
                             # Lower threshold for agencies since exact matches are important
                             if similarity > 0.5 or experience['employer'].lower() in attr['name'].lower():
                                 matched_attribute_ids.append(attr['id'])
-                                print(f"    Matched agency: {attr['name']} (ID: {attr['id']}, similarity: {similarity:.3f})")
+                                logger.debug("    Matched agency: %s (ID: %s, similarity: %.3f)", attr['name'], attr['id'], similarity)
                                 break  # Only take the best agency match
                 except Exception as e:
-                    print(f"    Warning: Error searching agency: {str(e)}")
+                    logger.warning("Error searching agency: %s", e)
             
             # Role search - use position only
             if experience.get('position'):
                 try:
-                    response = requests.get(
+                    response = self.http.get(
                         f"{self.api_base_url}/api/attributes",
                         params={
                             'type': 'role',
@@ -543,9 +555,9 @@ IMPORTANT:
                             similarity = attr.get('similarity_score', 0)
                             if similarity > 0.6:  # Lower threshold for roles
                                 matched_attribute_ids.append(attr['id'])
-                                print(f"    Matched role: {attr['name']} (ID: {attr['id']}, similarity: {similarity:.3f})")
+                                logger.debug("    Matched role: %s (ID: %s, similarity: %.3f)", attr['name'], attr['id'], similarity)
                 except Exception as e:
-                    print(f"    Warning: Error searching role: {str(e)}")
+                    logger.warning("Error searching role: %s", e)
             
             # Skip seniority, skill, and program searches for now to improve speed
             # These are less critical and slow down the process significantly
@@ -561,7 +573,7 @@ IMPORTANT:
                 "analysis_notes": f"Fast API search found {len(matched_attribute_ids)} key attributes"
             }
             experiences_with_attributes.append(exp_with_attrs)
-            print(f"    Total: {len(matched_attribute_ids)} attributes matched")
+            logger.debug("    Total: %d attributes matched", len(matched_attribute_ids))
         
         return experiences_with_attributes
     
@@ -658,7 +670,7 @@ IMPORTANT:
             }
             experiences_with_attributes.append(exp_with_attrs)
             
-            print(f"  Experience {exp_index}: {len(analysis.get('attribute_ids', []))} attributes")
+            logger.debug("  Experience %d: %d attributes", exp_index, len(analysis.get('attribute_ids', [])))
         
         return {"experiences": experiences_with_attributes}
     
@@ -666,12 +678,12 @@ IMPORTANT:
         """
         Fallback to individual experience processing if batch fails
         """
-        print("Step 2 (fallback): Analyzing attributes for each experience individually...")
+        logger.debug("Step 2 (fallback): Analyzing attributes for each experience individually...")
         analysis_start = time.time()
         
         experiences_with_attributes = []
         for i, experience in enumerate(structured_data.get("experiences", [])):
-            print(f"  Analyzing experience {i+1}/{len(structured_data.get('experiences', []))}: {experience.get('position')} at {experience.get('employer')}")
+            logger.debug("  Analyzing experience %d/%d: %s at %s", i + 1, len(structured_data.get('experiences', [])), experience.get('position'), experience.get('employer'))
             
             try:
                 attribute_analysis = self.analyze_experience_attributes(experience)
@@ -688,10 +700,10 @@ IMPORTANT:
                 }
                 experiences_with_attributes.append(exp_with_attrs)
                 
-                print(f"    Found {len(attribute_ids)} relevant attributes")
+                logger.debug("    Found %d relevant attributes", len(attribute_ids))
                 
             except Exception as e:
-                print(f"    Warning: Failed to analyze attributes for experience: {str(e)}")
+                logger.warning("Failed to analyze attributes for experience: %s", e)
                 experiences_with_attributes.append({
                     **experience,
                     "attribute_ids": [],
@@ -699,8 +711,8 @@ IMPORTANT:
                 })
         
         analysis_time = time.time() - analysis_start
-        print(f"Fallback attribute analysis completed in {analysis_time:.2f}s")
-        print(f"Total extraction time: {extraction_time + analysis_time:.2f}s")
+        logger.debug("Fallback attribute analysis completed in %.2fs", analysis_time)
+        logger.info("Total extraction time: %.2fs", extraction_time + analysis_time)
         
         return {
             "expert": structured_data.get("expert", {}),
@@ -748,7 +760,7 @@ IMPORTANT:
         extraction_start = time.time()
         raw_data = self.extract_from_template("expert_extraction_fast", {"text": text})
         extraction_time = time.time() - extraction_start
-        print(f"DEBUG - Fast extraction completed in {extraction_time:.2f}s")
+        logger.debug("Fast extraction completed in %.2fs", extraction_time)
         
         # Step 2: Search for attributes in database
         search_start = time.time()
@@ -786,22 +798,25 @@ IMPORTANT:
                         total_processed += 1
                 
                 if terms:
-                    print(f"DEBUG - Processed {len(terms)} {attr_type} terms")
+                    logger.debug("Processed %d %s terms", len(terms), attr_type)
             
             # Count skipped terms (other_terms not in configured types)
             other_terms = exp_data.get('other_terms', [])
             if other_terms:
                 total_skipped = len(other_terms)
-                print(f"DEBUG - Skipped {total_skipped} other_terms (not in SEARCHABLE_ATTRIBUTE_TYPES: {SEARCHABLE_ATTRIBUTE_TYPES})")
+                logger.debug("Skipped %d other_terms (not in SEARCHABLE_ATTRIBUTE_TYPES: %s)", total_skipped, SEARCHABLE_ATTRIBUTE_TYPES)
             
-            print(f"DEBUG - Total processed: {total_processed} attributes, skipped: {total_skipped}")
+            logger.debug("Total processed: %d attributes, skipped: %d", total_processed, total_skipped)
             
             experiences.append(experience)
         
         search_time = time.time() - search_start  
-        print(f"DEBUG - Attribute search completed in {search_time:.2f}s")
+        logger.debug("Attribute search completed in %.2fs", search_time)
         
         return {
             'expert': raw_data.get('expert', {}),
             'experiences': experiences
-        }
\ No newline at end of file
+        }
+
+# Global instance for reuse across requests
+llm_extractor = LLMExtractor()
@@ -0,0 +1,52 @@
+import logging
+from typing import Dict
+
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+def install_query_counter(app: Flask, engine: Engine, limits: Dict[str, int], default_limit: int):
+    """
+    Count SQL statements per request and warn when an endpoint exceeds its budget
+
+    Every buffered response gets an X-Query-Count header. Streamed responses
+    (stream_json_list) run most of their queries after the headers are sent,
+    so they get no header; their budget is checked once the body has been
+    sent instead. The listener is attached to
+    the engine, so it also sees statements from execution_options() copies
+    such as the read-only engine. Only install it in development/CI; when it
+    isn't installed there is no per-statement overhead.
+
+    Args:
+        app: Flask app to add the request hooks to
+        engine: Engine whose statements are counted
+        limits: Maximum statements per request, keyed by endpoint name
+        default_limit: Budget for endpoints not listed in limits
+    """
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.query_count = g.get('query_count', 0) + 1
+
+    @app.after_request
+    def check_query_count(response):
+        limit = limits.get(request.endpoint, default_limit)
+        method, path = request.method, request.path
+
+        def check(count):
+            if count > limit:
+                logger.warning("%s %s ran %d SQL statements (budget %d)", method, path, count, limit)
+
+        if response.is_streamed:
+            # g outlives the streamed body (stream_with_context keeps the
+            # request context), so read it once the response is closed
+            request_g = g._get_current_object()
+            response.call_on_close(lambda: check(request_g.get('query_count', 0)))
+            return response
+        count = g.get('query_count', 0)
+        check(count)
+        response.headers['X-Query-Count'] = str(count)
+        return response
@@ -0,0 +1,132 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from flask import Response, request
+
+from config import RESPONSE_CACHE_TIMEOUT
+from lib.serialization import dumps, json_response
+
+
+class CachedResponse:
+    """Serialized JSON body plus its ETag"""
+
+    def __init__(self, body: bytes, expires_at: float):
+        self.body = body
+        self.etag = hashlib.md5(body).hexdigest()
+        self.expires_at = expires_at
+
+    def to_response(self, cache_control: Optional[str] = None) -> Response:
+        """
+        Build a response for the current request, answering 304 when the client's ETag matches
+
+        Args:
+            cache_control: Cache-Control header value to send, if any
+        """
+        response = json_response(self.body)
+        response.set_etag(self.etag)
+        if cache_control:
+            response.headers['Cache-Control'] = cache_control
+        return response.make_conditional(request)
+
+
+class ResponseCache:
+    """
+    In-process TTL cache of serialized GET response bodies
+
+    Writers call invalidate() after committing so readers never see data older
+    than the last write made through this process; the TTL bounds staleness
+    for writes made by other processes.
+    """
+
+    def __init__(self, timeout: int = 60, max_entries: int = 512):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.version = 0
+        self._entries: Dict[Hashable, CachedResponse] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at < time.monotonic():
+            return None
+        return entry
+
+    def set(self, key: Hashable, payload: Any, version: int) -> CachedResponse:
+        """
+        Serialize and store a payload
+
+        Args:
+            key: Cache key
+            payload: JSON-serializable response data
+            version: Value of self.version read before the payload was built;
+                the entry is not stored if a write happened in the meantime
+
+        Returns:
+            The cached entry (returned even when it was not stored)
+        """
+        return self.set_body(key, dumps(payload), version)
+
+    def set_body(self, key: Hashable, body: bytes, version: int) -> CachedResponse:
+        """
+        Store an already-serialized JSON body, e.g. one that was streamed to the client
+
+        Args:
+            key: Cache key
+            body: UTF-8 encoded JSON
+            version: Value of self.version read before the body was built
+
+        Returns:
+            The cached entry (returned even when it was not stored)
+        """
+        entry = CachedResponse(body, time.monotonic() + self.timeout)
+        with self._lock:
+            if version == self.version:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+                self._entries[key] = entry
+        return entry
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+
+# Returned by TTLCache.get() for absent or expired keys, so None can be cached
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU of arbitrary values whose entries also expire after a timeout"""
+
+    def __init__(self, timeout: int, max_entries: int = 1024):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value, or MISSING when absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Global instance for expert read endpoints
+expert_response_cache = ResponseCache(timeout=RESPONSE_CACHE_TIMEOUT)
+
+# Global instance for prompt read endpoints
+prompt_response_cache = ResponseCache(timeout=RESPONSE_CACHE_TIMEOUT)
@@ -0,0 +1,221 @@
+import json
+import keyword
+from datetime import date, datetime
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence
+
+from flask import Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+except ImportError:
+    orjson = None
+
+
+def _json_default(value):
+    # numpy arrays/scalars (e.g. pgvector embeddings) and dates for the stdlib fallback
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload: Any) -> bytes:
+    """
+    Serialize a payload to JSON bytes, using orjson when it is installed
+
+    Args:
+        payload: JSON-serializable data; numpy arrays and dates are also accepted
+
+    Returns:
+        UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, option=_ORJSON_OPTIONS)
+    return json.dumps(payload, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+
+def loads(data: Any) -> Any:
+    """
+    Parse JSON text or bytes, using orjson when it is installed
+
+    Raises:
+        json.JSONDecodeError: On malformed input (orjson's error subclasses it)
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_response(body: bytes, status: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Wrap already-serialized JSON bytes in a Flask response"""
+    return Response(body, status=status, headers=headers, mimetype='application/json')
+
+
+def iter_json_list(key: str, items: Iterable[Any], chunk_size: int = 100,
+                   fields: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+    """
+    Serialize a {"<key>": [...], **fields} document chunk by chunk
+
+    Args:
+        key: Name of the top-level list field
+        items: Iterable of JSON-serializable items, consumed lazily
+        chunk_size: Number of items serialized per yielded chunk
+        fields: Other top-level fields, written after the list
+
+    Yields:
+        Pieces of the UTF-8 encoded document, in order
+    """
+    yield b'{' + dumps(key) + b':['
+    chunk = []
+    separator = b''
+    for item in items:
+        chunk.append(dumps(item))
+        if len(chunk) >= chunk_size:
+            yield separator + b','.join(chunk)
+            separator = b','
+            chunk = []
+    if chunk:
+        yield separator + b','.join(chunk)
+    yield b']'
+    for name, value in (fields or {}).items():
+        yield b',' + dumps(name) + b':' + dumps(value)
+    yield b'}'
+
+
+def stream_json_list(key: str, items: Iterable[Any], chunk_size: int = 100,
+                     fields: Optional[Dict[str, Any]] = None,
+                     on_complete: Optional[Callable[[bytes], None]] = None) -> Response:
+    """
+    Stream a {"<key>": [...], **fields} document without materializing the whole list
+
+    Args:
+        key: Name of the top-level list field
+        items: Iterable of JSON-serializable items, consumed lazily while the body is sent
+        chunk_size: Number of items serialized per chunk written to the client
+        fields: Other top-level fields, written after the list
+        on_complete: Called with the whole body once it has been fully sent
+            (e.g. to cache it); the serialized chunks are kept only when given
+
+    Returns:
+        Streaming JSON response; the request context stays active while the body
+        is generated, so queries run by lazy items are attributed to the request
+    """
+    @stream_with_context
+    def generate():
+        sent = [] if on_complete is not None else None
+        for piece in iter_json_list(key, items, chunk_size, fields):
+            if sent is not None:
+                sent.append(piece)
+            yield piece
+        if on_complete is not None:
+            on_complete(b''.join(sent))
+
+    return Response(generate(), mimetype='application/json')
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def model_serializer(model, fields: Sequence[str]) -> Callable[[Any], Dict[str, Any]]:
+    """
+    Generate a function that turns a loaded ORM instance into a dict of the given columns
+
+    The generated function reads column values straight from the instance
+    __dict__, skipping the instrumented attribute descriptors, and formats
+    date/datetime columns with isoformat(). It must only be used on instances
+    whose columns are loaded (i.e. not expired by a commit).
+
+    Args:
+        model: Mapped class
+        fields: Column names to include, in output order
+
+    Returns:
+        Serializer function taking one instance of the model
+    """
+    columns = model.__mapper__.columns
+    entries = []
+    for field in fields:
+        python_type = columns[field].type.python_type
+        if python_type in (date, datetime):
+            entries.append(f"{field!r}: _isoformat(d[{field!r}])")
+        else:
+            entries.append(f"{field!r}: d[{field!r}]")
+
+    name = f"serialize_{model.__tablename__}"
+    source = f"def {name}(obj):\n    d = obj.__dict__\n    return {{{', '.join(entries)}}}\n"
+    namespace = {'_isoformat': _isoformat}
+    exec(source, namespace)
+    return namespace[name]
+
+
+def row_serializer(name: str, fields: Sequence[str],
+                   computed: Optional[Dict[str, str]] = None) -> Callable[[Any], Dict[str, Any]]:
+    """
+    Generate a function that turns a result row into a dict keyed by its column names
+
+    The generated function unpacks the row positionally, so rows must have
+    exactly the given columns in the given order (e.g. from select(*columns)).
+
+    Args:
+        name: Suffix for the generated function's name, shown in tracebacks
+        fields: Column names in row order; each becomes a local variable
+        computed: Extra output keys mapped to Python expressions over those variables
+
+    Returns:
+        Serializer function taking one row
+    """
+    for field in fields:
+        if not field.isidentifier() or keyword.iskeyword(field):
+            raise ValueError(f"Column name {field!r} can't be used as a variable")
+    entries = [f"{field!r}: {field}" for field in fields]
+    entries += [f"{key!r}: {expression}" for key, expression in (computed or {}).items()]
+
+    function_name = f"serialize_{name}_row"
+    source = (
+        f"def {function_name}(row):\n"
+        f"    {', '.join(fields)}, = row\n"
+        f"    return {{{', '.join(entries)}}}\n"
+    )
+    namespace: Dict[str, Any] = {}
+    exec(source, namespace)
+    return namespace[function_name]
+
+
+def json_view(view: Callable) -> Callable:
+    """
+    View decorator that serializes dict or (dict, status) results with dumps()
+
+    Response objects returned by the view are passed through unchanged.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        result = view(*args, **kwargs)
+        if isinstance(result, Response):
+            return result
+        status = 200
+        if isinstance(result, tuple):
+            result, status = result
+        return json_response(dumps(result), status)
+
+    return wrapper
+
+
+def restful_json_output(data: Any, code: int, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Flask-RESTful 'application/json' representation backed by dumps()"""
+    return json_response(dumps(data), code, headers)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes with dumps() (orjson when installed)"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj).decode('utf-8')
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
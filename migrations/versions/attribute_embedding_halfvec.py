@@ -0,0 +1,36 @@
+"""Rebuild the attribute embedding HNSW index over half-precision vectors
+
+Revision ID: attribute_embedding_halfvec
+Revises: prompt_version_indexes
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'attribute_embedding_halfvec'
+down_revision = 'prompt_version_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # halfvec needs pgvector 0.7+
+    op.execute(
+        "CREATE INDEX ix_attribute_embedding_half_hnsw ON attribute "
+        "USING hnsw ((CAST(embedding AS halfvec(1536))) halfvec_cosine_ops)"
+    )
+    op.drop_index('ix_attribute_embedding_hnsw', table_name='attribute')
+
+
+def downgrade():
+    op.create_index(
+        'ix_attribute_embedding_hnsw',
+        'attribute',
+        ['embedding'],
+        postgresql_using='hnsw',
+        postgresql_ops={'embedding': 'vector_cosine_ops'}
+    )
+    op.drop_index('ix_attribute_embedding_half_hnsw', table_name='attribute')
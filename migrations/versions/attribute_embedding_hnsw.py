@@ -0,0 +1,30 @@
+"""Add HNSW index on attribute embeddings
+
+Revision ID: attribute_embedding_hnsw
+Revises: expert_profile_id_unique
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'attribute_embedding_hnsw'
+down_revision = 'expert_profile_id_unique'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_attribute_embedding_hnsw',
+        'attribute',
+        ['embedding'],
+        postgresql_using='hnsw',
+        postgresql_ops={'embedding': 'vector_cosine_ops'}
+    )
+
+
+def downgrade():
+    op.drop_index('ix_attribute_embedding_hnsw', table_name='attribute')
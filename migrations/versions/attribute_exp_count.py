@@ -0,0 +1,69 @@
+"""Add trigger-maintained experience count to attribute
+
+Revision ID: attribute_exp_count
+Revises: attribute_embedding_hnsw
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'attribute_exp_count'
+down_revision = 'attribute_embedding_hnsw'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('attribute', sa.Column('exp_count', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    op.execute("""
+        UPDATE attribute a
+        SET exp_count = c.cnt
+        FROM (SELECT attribute_id, count(*) AS cnt FROM experience_attribute GROUP BY attribute_id) c
+        WHERE a.id = c.attribute_id
+    """)
+
+    # Statement-level triggers with transition tables: one UPDATE per statement,
+    # so bulk link inserts (executemany, COPY) don't update attribute row by row
+    op.execute("""
+        CREATE FUNCTION attribute_exp_count_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE attribute a
+            SET exp_count = a.exp_count + n.cnt
+            FROM (SELECT attribute_id, count(*) AS cnt FROM new_links GROUP BY attribute_id) n
+            WHERE a.id = n.attribute_id;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute("""
+        CREATE FUNCTION attribute_exp_count_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE attribute a
+            SET exp_count = a.exp_count - o.cnt
+            FROM (SELECT attribute_id, count(*) AS cnt FROM old_links GROUP BY attribute_id) o
+            WHERE a.id = o.attribute_id;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute("""
+        CREATE TRIGGER experience_attribute_exp_count_insert
+        AFTER INSERT ON experience_attribute
+        REFERENCING NEW TABLE AS new_links
+        FOR EACH STATEMENT EXECUTE FUNCTION attribute_exp_count_insert()
+    """)
+    op.execute("""
+        CREATE TRIGGER experience_attribute_exp_count_delete
+        AFTER DELETE ON experience_attribute
+        REFERENCING OLD TABLE AS old_links
+        FOR EACH STATEMENT EXECUTE FUNCTION attribute_exp_count_delete()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER experience_attribute_exp_count_delete ON experience_attribute")
+    op.execute("DROP TRIGGER experience_attribute_exp_count_insert ON experience_attribute")
+    op.execute("DROP FUNCTION attribute_exp_count_delete()")
+    op.execute("DROP FUNCTION attribute_exp_count_insert()")
+    op.drop_column('attribute', 'exp_count')
@@ -0,0 +1,70 @@
+"""Drop the exp_count triggers in favour of batch recomputes
+
+Revision ID: attribute_exp_count_batch
+Revises: attribute_version
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'attribute_exp_count_batch'
+down_revision = 'attribute_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Each link-writing statement locked every attribute it touched until its
+    # transaction ended, serializing writers on popular attributes;
+    # database.refresh_attribute_exp_counts now recomputes the counts instead
+    op.execute("DROP TRIGGER experience_attribute_exp_count_delete ON experience_attribute")
+    op.execute("DROP TRIGGER experience_attribute_exp_count_insert ON experience_attribute")
+    op.execute("DROP FUNCTION attribute_exp_count_delete()")
+    op.execute("DROP FUNCTION attribute_exp_count_insert()")
+
+
+def downgrade():
+    # Counts may have drifted while no trigger maintained them
+    op.execute("""
+        UPDATE attribute a
+        SET exp_count = COALESCE(c.cnt, 0)
+        FROM attribute a2
+        LEFT JOIN (SELECT attribute_id, count(*) AS cnt FROM experience_attribute GROUP BY attribute_id) c
+            ON c.attribute_id = a2.id
+        WHERE a.id = a2.id AND a.exp_count <> COALESCE(c.cnt, 0)
+    """)
+    op.execute("""
+        CREATE FUNCTION attribute_exp_count_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE attribute a
+            SET exp_count = a.exp_count + n.cnt
+            FROM (SELECT attribute_id, count(*) AS cnt FROM new_links GROUP BY attribute_id) n
+            WHERE a.id = n.attribute_id;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute("""
+        CREATE FUNCTION attribute_exp_count_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE attribute a
+            SET exp_count = a.exp_count - o.cnt
+            FROM (SELECT attribute_id, count(*) AS cnt FROM old_links GROUP BY attribute_id) o
+            WHERE a.id = o.attribute_id;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute("""
+        CREATE TRIGGER experience_attribute_exp_count_insert
+        AFTER INSERT ON experience_attribute
+        REFERENCING NEW TABLE AS new_links
+        FOR EACH STATEMENT EXECUTE FUNCTION attribute_exp_count_insert()
+    """)
+    op.execute("""
+        CREATE TRIGGER experience_attribute_exp_count_delete
+        AFTER DELETE ON experience_attribute
+        REFERENCING OLD TABLE AS old_links
+        FOR EACH STATEMENT EXECUTE FUNCTION attribute_exp_count_delete()
+    """)
@@ -0,0 +1,26 @@
+"""Add generated name_lower column to attribute
+
+Revision ID: attribute_name_lower
+Revises: 0a7d9861680b
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'attribute_name_lower'
+down_revision = '0a7d9861680b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('attribute', sa.Column('name_lower', sa.String(length=128), sa.Computed('lower(name)', persisted=True), nullable=True))
+    op.create_index('ix_attribute_name_lower_type', 'attribute', ['name_lower', 'type'])
+
+
+def downgrade():
+    op.drop_index('ix_attribute_name_lower_type', table_name='attribute')
+    op.drop_column('attribute', 'name_lower')
@@ -0,0 +1,46 @@
+"""Add a trigger-maintained attribute version counter
+
+Revision ID: attribute_version
+Revises: attribute_embedding_halfvec
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'attribute_version'
+down_revision = 'attribute_embedding_halfvec'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'attribute_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.BigInteger(), server_default=sa.text('0'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO attribute_version (id, version) VALUES (1, 0)")
+
+    # Statement-level, so a bulk load bumps the counter once per statement
+    op.execute("""
+        CREATE FUNCTION attribute_version_bump() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE attribute_version SET version = version + 1 WHERE id = 1;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute("""
+        CREATE TRIGGER attribute_version_bump
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON attribute
+        FOR EACH STATEMENT EXECUTE FUNCTION attribute_version_bump()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER attribute_version_bump ON attribute")
+    op.execute("DROP FUNCTION attribute_version_bump()")
+    op.drop_table('attribute_version')
@@ -0,0 +1,30 @@
+"""Add unique index on expert source profile_id
+
+Revision ID: expert_profile_id_unique
+Revises: attribute_name_lower
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'expert_profile_id_unique'
+down_revision = 'attribute_name_lower'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ux_expert_profile_id',
+        'expert',
+        [sa.text("(meta ->> 'profile_id')")],
+        unique=True,
+        postgresql_where=sa.text("(meta ->> 'profile_id') IS NOT NULL")
+    )
+
+
+def downgrade():
+    op.drop_index('ux_expert_profile_id', table_name='expert')
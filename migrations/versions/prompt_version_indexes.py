@@ -0,0 +1,42 @@
+"""Replace prompt template indexes with a descending covering index and a partial active index
+
+Revision ID: prompt_version_indexes
+Revises: attribute_exp_count
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'prompt_version_indexes'
+down_revision = 'attribute_exp_count'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Serves the MAX(version_number) lookup and the version-ordered list
+    op.create_index(
+        'ix_prompt_template_version_desc',
+        'prompt',
+        ['template_name', sa.text('version_number DESC')],
+        postgresql_include=['is_active_version', 'id']
+    )
+    # At most one row per template, so the active-version lookup stays tiny
+    op.create_index(
+        'ix_prompt_template_active_only',
+        'prompt',
+        ['template_name'],
+        postgresql_where=sa.text('is_active_version')
+    )
+    op.drop_index('ix_prompt_template_active', table_name='prompt')
+    op.drop_index('ix_prompt_template_name_version', table_name='prompt')
+
+
+def downgrade():
+    op.create_index('ix_prompt_template_name_version', 'prompt', ['template_name', 'version_number'])
+    op.create_index('ix_prompt_template_active', 'prompt', ['template_name', 'is_active_version'])
+    op.drop_index('ix_prompt_template_active_only', table_name='prompt')
+    op.drop_index('ix_prompt_template_version_desc', table_name='prompt')
@@ -1,8 +1,8 @@
 from typing import List, Optional
 from datetime import date, datetime
-from sqlalchemy import ForeignKey, String, Date, Text, Boolean, Enum, Index, JSON, event, Table, Column, Integer, DateTime
+from sqlalchemy import ForeignKey, String, Date, Text, Boolean, Enum, Index, JSON, event, Table, Column, Integer, BigInteger, DateTime, Computed, cast, literal_column, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import HALFVEC, Vector
 
 
 class Base(DeclarativeBase):
@@ -16,8 +16,25 @@ experience_attribute_association = Table(
     Column('attribute_id', Integer, ForeignKey('attribute.id'), primary_key=True)
 )
 
+# Single-row counter bumped by a statement trigger on every write to attribute,
+# so in-process attribute indexes can detect changes with one cheap read
+attribute_version = Table(
+    'attribute_version',
+    Base.metadata,
+    Column('id', Integer, primary_key=True),
+    Column('version', BigInteger, nullable=False, server_default=text('0'))
+)
+
+# Source profile ID stored in Expert.meta by the expert loader
+EXPERT_PROFILE_ID = literal_column("(meta ->> 'profile_id')")
+
 class Expert(Base):
     __tablename__ = "expert"
+    __table_args__ = (
+        # One expert per source profile; makes loader inserts idempotent
+        Index('ux_expert_profile_id', text("(meta ->> 'profile_id')"), unique=True,
+              postgresql_where=text("(meta ->> 'profile_id') IS NOT NULL")),
+    )
 
     class Status:
         pending = 'pending'
@@ -69,6 +86,7 @@ class Attribute(Base):
     __table_args__ = (
         Index('ix_attribute_type', 'type'),
         Index('ix_attribute_type_name', 'type', 'name', unique=True),
+        Index('ix_attribute_name_lower_type', 'name_lower', 'type'),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -76,9 +94,14 @@ class Attribute(Base):
     depth: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
 
     name: Mapped[str] = mapped_column(String(128))
+    # Generated by the database for indexed case-insensitive name lookups
+    name_lower: Mapped[Optional[str]] = mapped_column(String(128), Computed("lower(name)", persisted=True))
     type: Mapped[str] = mapped_column(String(128))
     summary: Mapped[str] = mapped_column(Text())
     embedding: Mapped[Optional[List[float]]] = mapped_column(Vector(1536), nullable=True)  # OpenAI embeddings are 1536 dimensions
+    # Number of linked experiences; recomputed in batches by database.refresh_attribute_exp_counts,
+    # so it can lag recent link writes by up to EXP_COUNT_REFRESH_INTERVAL
+    exp_count: Mapped[int] = mapped_column(Integer, server_default=text('0'), nullable=False)
 
     # Self-referential relationship for taxonomy
     parent: Mapped[Optional["Attribute"]] = relationship("Attribute", remote_side=[id], back_populates="children")
@@ -92,12 +115,20 @@ class Attribute(Base):
     def __repr__(self) -> str:
         return f"Attribute(id={self.id!r}, name={self.name!r}, type={self.type!r})"
 
+# Approximate nearest-neighbour index for cosine-distance searches, built over
+# half-precision copies of the embeddings (half the size of a full-precision
+# index); searches must ORDER BY CAST(embedding AS halfvec(1536)) <=> ... to use it
+Index('ix_attribute_embedding_half_hnsw',
+      cast(Attribute.__table__.c.embedding, HALFVEC(1536)).label('embedding_half'),
+      postgresql_using='hnsw', postgresql_ops={'embedding_half': 'halfvec_cosine_ops'})
+
 
 class Prompt(Base):
     __tablename__ = "prompt"
     __table_args__ = (
-        Index('ix_prompt_template_name_version', 'template_name', 'version_number'),
-        Index('ix_prompt_template_active', 'template_name', 'is_active_version'),
+        Index('ix_prompt_template_version_desc', 'template_name', text('version_number DESC'),
+              postgresql_include=['is_active_version', 'id']),
+        Index('ix_prompt_template_active_only', 'template_name', postgresql_where=text('is_active_version')),
     )
     
     class PromptType:
@@ -1,51 +1,321 @@
+import logging
 from flask import request
-from flask_restful import Resource
-from models import Expert, Experience, Attribute
-from lib.llm_extractor import LLMExtractor
+from flask.views import MethodView
+from models import Expert, Experience, Attribute, experience_attribute_association
+from lib.llm_extractor import llm_extractor
 from lib.embedding_service import embedding_service
+from lib.response_cache import expert_response_cache
+from lib.serialization import json_view, model_serializer, stream_json_list
+from lib.dates import parse_date
 from database import get_db_session
-from config import SEARCHABLE_ATTRIBUTE_TYPES, ATTRIBUTE_MATCHING_THRESHOLD
-from datetime import datetime
-from sqlalchemy import text
+from config import SEARCHABLE_ATTRIBUTE_TYPES, ATTRIBUTE_MATCHING_THRESHOLD, STRICT_EAGER_LOADING
+from datetime import date
+from sqlalchemy import distinct, func, insert, select
+from sqlalchemy.orm import raiseload, selectinload
+
+logger = logging.getLogger(__name__)
+
+# End-date values the LLM uses for an ongoing experience
+PRESENT_END_DATES = frozenset({'present', 'current', 'ongoing', 'now'})
+
+# Experts fetched per batch while the expert list streams
+EXPERT_LIST_YIELD_PER = 25
+
+# Generated once at import; read loaded column values without descriptor overhead
+_serialize_expert = model_serializer(Expert, ['id', 'name', 'summary', 'status', 'meta'])
+_serialize_experience = model_serializer(
+    Experience, ['id', 'employer', 'position', 'start_date', 'end_date', 'summary']
+)
+_serialize_attribute = model_serializer(Attribute, ['id', 'name', 'type', 'summary'])
+_serialize_attribute_with_taxonomy = model_serializer(
+    Attribute, ['id', 'name', 'type', 'summary', 'depth', 'parent_id']
+)
+
+
+def _expert_graph_options():
+    """Eager-load experiences and their attributes; in strict mode any other lazy load raises"""
+    experiences = selectinload(Expert.experiences)
+    if not STRICT_EAGER_LOADING:
+        return [experiences.selectinload(Experience.attributes)]
+    return [
+        experiences.options(selectinload(Experience.attributes).raiseload('*'), raiseload('*')),
+        raiseload('*')
+    ]
+
+
+def _iter_experts_with_experiences(session, filters, offset, limit):
+    """Yield one page of experts with full experience and attribute data, loaded in batches"""
+    experts = (
+        session.query(Expert)
+        .options(*_expert_graph_options())
+        .filter(*filters)
+        .order_by(Expert.id)
+        .offset(offset)
+        .limit(limit)
+        .yield_per(EXPERT_LIST_YIELD_PER)
+    )
+    for expert in experts:
+        expert_info = _serialize_expert(expert)
+        expert_info['experiences'] = []
+        for exp in expert.experiences:
+            exp_info = _serialize_experience(exp)
+            exp_info['attributes'] = [_serialize_attribute_with_taxonomy(attr) for attr in exp.attributes]
+            expert_info['experiences'].append(exp_info)
+        yield expert_info
+
+
+def _iter_experts_with_stats(session, filters, offset, limit):
+    """
+    Yield one page of experts with experience and attribute counts
+
+    The counts for the whole page come from one grouped subquery joined to
+    the page, instead of three COUNT queries per expert.
+    """
+    link = experience_attribute_association
+    page = (
+        select(Expert.id, Expert.name, Expert.summary, Expert.status, Expert.meta)
+        .where(*filters)
+        .order_by(Expert.id)
+        .offset(offset)
+        .limit(limit)
+        .cte('page')
+    )
+    stats = (
+        select(
+            Experience.expert_id,
+            func.count(distinct(Experience.id)).label('total_experiences'),
+            func.count(Attribute.id).label('total_attributes'),
+            func.count(distinct(Attribute.type)).label('unique_attribute_types')
+        )
+        .select_from(Experience)
+        .outerjoin(link, link.c.experience_id == Experience.id)
+        .outerjoin(Attribute, Attribute.id == link.c.attribute_id)
+        .where(Experience.expert_id.in_(select(page.c.id)))
+        .group_by(Experience.expert_id)
+        .subquery('stats')
+    )
+    query = (
+        select(
+            page,
+            func.coalesce(stats.c.total_experiences, 0).label('total_experiences'),
+            func.coalesce(stats.c.total_attributes, 0).label('total_attributes'),
+            func.coalesce(stats.c.unique_attribute_types, 0).label('unique_attribute_types')
+        )
+        .select_from(page)
+        .outerjoin(stats, stats.c.expert_id == page.c.id)
+        .order_by(page.c.id)
+        .execution_options(yield_per=EXPERT_LIST_YIELD_PER)
+    )
+    for row in session.execute(query):
+        yield {
+            'id': row.id,
+            'name': row.name,
+            'summary': row.summary,
+            'status': row.status,
+            'meta': row.meta,
+            'stats': {
+                'total_experiences': row.total_experiences,
+                'total_attributes': row.total_attributes,
+                'unique_attribute_types': row.unique_attribute_types
+            }
+        }
+
+
+def _create_expert():
+    """Shared logic for creating experts from both structured and unstructured input"""
+    session = get_db_session()
+    try:
+        content_type = request.headers.get('Content-Type', '')
+        
+        if 'application/json' in content_type:
+            # Handle structured input
+            data = request.get_json()
+            expert = Expert(
+                name=data.get('name'),
+                summary=data.get('summary'),
+                status=data.get('status', True)
+            )
+            session.add(expert)
+            session.commit()
+            expert_response_cache.invalidate()
+            return {
+                'id': expert.id,
+                'name': expert.name,
+                'summary': expert.summary,
+                'status': expert.status,
+                'meta': expert.meta
+            }, 201
+        
+        elif 'text/plain' in content_type or content_type == '':
+            # Handle unstructured text input with two-step extraction
+            text = request.get_data(as_text=True)
+            if not text.strip():
+                return {'message': 'Empty text provided'}, 400
+            
+            result = _create_expert_from_text(session, text)
+            session.commit()
+            expert_response_cache.invalidate()
+            return result, 201
+        
+        else:
+            return {'message': 'Unsupported content type. Use application/json or text/plain'}, 400
+            
+    except Exception as e:
+        session.rollback()
+        return {'message': f'Expert creation failed: {str(e)}'}, 400
+    finally:
+        session.close()
+
+
+def _create_expert_from_text(session, text):
+    """Extract an expert from unstructured text and add it, its experiences and attribute links to the session"""
+    # Extract structured data using two-step process. This runs before the
+    # session's first statement, so no pooled connection sits idle during the
+    # LLM calls, which themselves call back into /api/attributes and /api/prompts.
+    extracted_data = llm_extractor.extract_expert_with_attributes(text)
+
+    # Create expert
+    expert_data = extracted_data.get('expert', {})
+    expert = Expert(
+        name=expert_data.get('name'),
+        summary=expert_data.get('summary'),
+        status=True,
+        meta={'source': 'llm_extraction', 'original_text': text}
+    )
+    session.add(expert)
+    session.flush()
+
+    # Parse all experiences up front so they can be inserted in one statement
+    experiences_data = extracted_data.get('experiences', [])
+    experience_rows = []
+
+    for exp_data in experiences_data:
+        # Parse dates; the LLM sometimes returns full timestamps
+        start_date = parse_date(exp_data['start_date'])
+        end_date_str = exp_data['end_date']
+        if end_date_str.lower() in PRESENT_END_DATES:
+            end_date = date.today()
+        else:
+            end_date = parse_date(end_date_str)
+
+        # Create experience with structured data
+        employer = exp_data.get('employer', '')
+        position = exp_data.get('position', '')
+        # Use 'summary' from the data, or 'activities' for backwards compatibility
+        summary = exp_data.get('summary', exp_data.get('activities', ''))
+
+        # If summary is not provided, create from structured fields
+        if not summary and (position or employer):
+            summary = f"{position} at {employer}"
+
+        experience_rows.append({
+            'expert_id': expert.id,
+            'employer': employer,
+            'position': position,
+            'start_date': start_date,
+            'end_date': end_date,
+            'summary': summary
+        })
+
+    # Single multi-row INSERT ... RETURNING instead of one flush per experience
+    experience_ids = []
+    if experience_rows:
+        experience_ids = session.scalars(
+            insert(Experience).returning(Experience.id, sort_by_parameter_order=True),
+            experience_rows
+        ).all()
+
+    # Load every referenced attribute in one query
+    all_attribute_ids = {
+        attr_id for exp_data in experiences_data for attr_id in exp_data.get('attribute_ids', [])
+    }
+    attributes_by_id = {}
+    if all_attribute_ids:
+        attributes_by_id = {
+            attribute.id: attribute
+            for attribute in session.query(Attribute).filter(Attribute.id.in_(all_attribute_ids))
+        }
+
+    # Process attribute IDs from LLM analysis
+    created_experiences = []
+    association_rows = []
+
+    for exp_data, experience_row, experience_id in zip(experiences_data, experience_rows, experience_ids):
+        matched_attributes = []
+        associated_ids = set()
+
+        for attr_id in exp_data.get('attribute_ids', []):
+            attribute = attributes_by_id.get(attr_id)
+
+            if attribute:
+                # Associate existing database attribute with this experience
+                if attr_id not in associated_ids:
+                    associated_ids.add(attr_id)
+                    association_rows.append({'experience_id': experience_id, 'attribute_id': attr_id})
+
+                matched_attributes.append({
+                    'id': attribute.id,
+                    'name': attribute.name,
+                    'type': attribute.type,
+                    'summary': attribute.summary
+                })
+            else:
+                logger.warning("Attribute ID %s not found in database", attr_id)
+
+        created_experiences.append({
+            'employer': exp_data.get('employer', ''),
+            'position': exp_data.get('position', ''),
+            'start_date': experience_row['start_date'].isoformat(),
+            'end_date': experience_row['end_date'].isoformat(),
+            'summary': experience_row['summary'],
+            'attributes': matched_attributes,
+            'analysis_notes': exp_data.get('analysis_notes', '')
+        })
+
+    # All experience/attribute links in one executemany
+    if association_rows:
+        session.execute(experience_attribute_association.insert(), association_rows)
+
+    return {
+        'id': expert.id,
+        'name': expert.name,
+        'summary': expert.summary,
+        'status': expert.status,
+        'meta': expert.meta,
+        'experiences': created_experiences,
+        'extraction_source': 'two_step_extraction_with_attribute_analysis'
+    }
+
+
+class ExpertResource(MethodView):
+    decorators = [json_view]
 
-class ExpertResource(Resource):
     def get(self, expert_id):
+        cache_key = ('expert', expert_id)
+        cached = expert_response_cache.get(cache_key)
+        if cached is not None:
+            return cached.to_response()
+        
+        cache_version = expert_response_cache.version
         session = get_db_session()
         try:
-            expert = session.query(Expert).filter(Expert.id == expert_id).first()
+            expert = session.query(Expert).options(*_expert_graph_options()).filter(Expert.id == expert_id).first()
             if not expert:
                 return {'message': 'Expert not found'}, 404
             
-            return {
-                'id': expert.id,
-                'name': expert.name,
-                'summary': expert.summary,
-                'status': expert.status,
-                'meta': expert.meta,
-                'experiences': [
-                    {
-                        'id': exp.id,
-                        'employer': exp.employer,
-                        'position': exp.position,
-                        'start_date': exp.start_date.isoformat(),
-                        'end_date': exp.end_date.isoformat(),
-                        'summary': exp.summary,
-                        'attributes': [
-                            {
-                                'id': attr.id,
-                                'name': attr.name,
-                                'type': attr.type,
-                                'summary': attr.summary
-                            } for attr in exp.attributes
-                        ]
-                    } for exp in expert.experiences
-                ]
-            }
+            expert_info = _serialize_expert(expert)
+            expert_info['experiences'] = []
+            for exp in expert.experiences:
+                exp_info = _serialize_experience(exp)
+                exp_info['attributes'] = [_serialize_attribute(attr) for attr in exp.attributes]
+                expert_info['experiences'].append(exp_info)
+            
+            return expert_response_cache.set(cache_key, expert_info, cache_version).to_response()
         finally:
             session.close()
 
     def post(self):
-        return self._create_expert()
+        return _create_expert()
                 
     
     def _find_matching_database_attribute(self, session, extracted_term, attr_type, similarity_threshold=None):
@@ -73,138 +343,6 @@ class ExpertResource(Resource):
         
         return (best_match, best_similarity) if best_match else (None, 0.0)
     
-    def _create_expert(self):
-        """Shared logic for creating experts from both structured and unstructured input"""
-        session = get_db_session()
-        try:
-            content_type = request.headers.get('Content-Type', '')
-            
-            if 'application/json' in content_type:
-                # Handle structured input
-                data = request.get_json()
-                expert = Expert(
-                    name=data.get('name'),
-                    summary=data.get('summary'),
-                    status=data.get('status', True)
-                )
-                session.add(expert)
-                session.commit()
-                return {
-                    'id': expert.id,
-                    'name': expert.name,
-                    'summary': expert.summary,
-                    'status': expert.status,
-                    'meta': expert.meta
-                }, 201
-            
-            elif 'text/plain' in content_type or content_type == '':
-                # Handle unstructured text input with two-step extraction
-                text = request.get_data(as_text=True)
-                if not text.strip():
-                    return {'message': 'Empty text provided'}, 400
-                
-                # Extract structured data using two-step process
-                extractor = LLMExtractor()
-                extracted_data = extractor.extract_expert_with_attributes(text)
-                
-                # Create expert
-                expert_data = extracted_data.get('expert', {})
-                expert = Expert(
-                    name=expert_data.get('name'),
-                    summary=expert_data.get('summary'),
-                    status=True,
-                    meta={'source': 'llm_extraction', 'original_text': text}
-                )
-                session.add(expert)
-                session.flush()
-                
-                # Create experiences with attributes from two-step extraction
-                created_experiences = []
-                experiences_data = extracted_data.get('experiences', [])
-                
-                for exp_data in experiences_data:
-                    # Parse dates
-                    start_date = datetime.fromisoformat(exp_data['start_date']).date()
-                    end_date_str = exp_data['end_date']
-                    if end_date_str.lower() in ['present', 'current', 'ongoing', 'now']:
-                        end_date = datetime.now().date()
-                    else:
-                        end_date = datetime.fromisoformat(end_date_str).date()
-                    
-                    # Create experience with structured data
-                    employer = exp_data.get('employer', '')
-                    position = exp_data.get('position', '')
-                    # Use 'summary' from the data, or 'activities' for backwards compatibility
-                    summary = exp_data.get('summary', exp_data.get('activities', ''))
-                    
-                    # If summary is not provided, create from structured fields
-                    if not summary and (position or employer):
-                        summary = f"{position} at {employer}"
-                    
-                    experience = Experience(
-                        expert_id=expert.id,
-                        employer=employer,
-                        position=position,
-                        start_date=start_date,
-                        end_date=end_date,
-                        summary=summary
-                    )
-                    session.add(experience)
-                    session.flush()
-                    
-                    # Process attribute IDs from LLM analysis
-                    matched_attributes = []
-                    attribute_ids = exp_data.get('attribute_ids', [])
-                    
-                    for attr_id in attribute_ids:
-                        # Get attribute from database by ID
-                        attribute = session.query(Attribute).filter(Attribute.id == attr_id).first()
-                        
-                        if attribute:
-                            # Associate existing database attribute with this experience
-                            if experience not in attribute.experiences:
-                                attribute.experiences.append(experience)
-                            
-                            matched_attributes.append({
-                                'id': attribute.id,
-                                'name': attribute.name,
-                                'type': attribute.type,
-                                'summary': attribute.summary
-                            })
-                        else:
-                            print(f"Warning: Attribute ID {attr_id} not found in database")
-                    
-                    created_experiences.append({
-                        'employer': exp_data.get('employer', ''),
-                        'position': exp_data.get('position', ''),
-                        'start_date': experience.start_date.isoformat(),
-                        'end_date': experience.end_date.isoformat(),
-                        'summary': experience.summary,
-                        'attributes': matched_attributes,
-                        'analysis_notes': exp_data.get('analysis_notes', '')
-                    })
-                
-                session.commit()
-                
-                return {
-                    'id': expert.id,
-                    'name': expert.name,
-                    'summary': expert.summary,
-                    'status': expert.status,
-                    'meta': expert.meta,
-                    'experiences': created_experiences,
-                    'extraction_source': 'two_step_extraction_with_attribute_analysis'
-                }, 201
-            
-            else:
-                return {'message': 'Unsupported content type. Use application/json or text/plain'}, 400
-                
-        except Exception as e:
-            session.rollback()
-            return {'message': f'Expert creation failed: {str(e)}'}, 400
-        finally:
-            session.close()
-
     def put(self, expert_id):
         session = get_db_session()
         try:
@@ -218,6 +356,7 @@ class ExpertResource(Resource):
             expert.status = data.get('status', expert.status)
             
             session.commit()
+            expert_response_cache.invalidate()
             return {
                 'id': expert.id,
                 'name': expert.name,
@@ -240,6 +379,7 @@ class ExpertResource(Resource):
             
             session.delete(expert)
             session.commit()
+            expert_response_cache.invalidate()
             return {'message': 'Expert deleted successfully'}
         except Exception as e:
             session.rollback()
@@ -247,119 +387,68 @@ class ExpertResource(Resource):
         finally:
             session.close()
 
-class ExpertListResource(Resource):
+class ExpertListResource(MethodView):
+    decorators = [json_view]
+
     def get(self):
+        cache_key = ('experts', tuple(sorted(request.args.items(multi=True))))
+        cached = expert_response_cache.get(cache_key)
+        if cached is not None:
+            return cached.to_response()
+        
+        cache_version = expert_response_cache.version
+        # Get pagination and search parameters with error handling
+        try:
+            page = max(1, int(request.args.get('page', 1)))
+            page_size = max(1, min(int(request.args.get('page_size', 20)), 100))  # Max 100 per page
+        except ValueError:
+            page = 1
+            page_size = 20
+        
+        search_name = request.args.get('search', '').strip()
+        include_experiences = request.args.get('include_experiences', 'false').lower() == 'true'
+        
+        # Calculate offset
+        offset = (page - 1) * page_size
+        
+        # Optional case-insensitive partial name filter
+        filters = [Expert.name.ilike(f'%{search_name}%')] if search_name else []
+        
+        # The session stays open while the page streams; server-side cursors
+        # need its transaction, and the response closes it when done
         session = get_db_session()
         try:
-            # Get pagination and search parameters with error handling
-            try:
-                page = max(1, int(request.args.get('page', 1)))
-                page_size = max(1, min(int(request.args.get('page_size', 20)), 100))  # Max 100 per page
-            except ValueError:
-                page = 1
-                page_size = 20
-            
-            search_name = request.args.get('search', '').strip()
-            include_experiences = request.args.get('include_experiences', 'false').lower() == 'true'
-            
-            # Calculate offset
-            offset = (page - 1) * page_size
-            
-            # Build base query with optional name filtering
-            base_query = session.query(Expert)
-            if search_name:
-                # Case-insensitive partial name search
-                base_query = base_query.filter(Expert.name.ilike(f'%{search_name}%'))
-            
             # Get total count with filters applied
-            total_count = base_query.count()
-            
-            # Get paginated experts
-            experts = base_query.offset(offset).limit(page_size).all()
-            
-            # Build response
-            expert_data = []
-            for expert in experts:
-                expert_info = {
-                    'id': expert.id,
-                    'name': expert.name,
-                    'summary': expert.summary,
-                    'status': expert.status,
-                    'meta': expert.meta
-                }
-                
-                if include_experiences:
-                    # Include full experience data with attributes
-                    expert_info['experiences'] = [
-                        {
-                            'id': exp.id,
-                            'employer': exp.employer,
-                            'position': exp.position,
-                            'start_date': exp.start_date.isoformat(),
-                            'end_date': exp.end_date.isoformat(),
-                            'summary': exp.summary,
-                            'attributes': [
-                                {
-                                    'id': attr.id,
-                                    'name': attr.name,
-                                    'type': attr.type,
-                                    'summary': attr.summary,
-                                    'depth': attr.depth,
-                                    'parent_id': attr.parent_id
-                                } for attr in exp.attributes
-                            ]
-                        } for exp in expert.experiences
-                    ]
-                else:
-                    # Calculate stats efficiently using separate queries
-                    total_experiences = session.query(Experience).filter(Experience.expert_id == expert.id).count()
-                    total_attributes = session.execute(text("""
-                        SELECT COUNT(a.id) 
-                        FROM attribute a 
-                        JOIN experience_attribute ea ON a.id = ea.attribute_id 
-                        JOIN experience e ON ea.experience_id = e.id 
-                        WHERE e.expert_id = :expert_id
-                    """), {'expert_id': expert.id}).scalar() or 0
-                    
-                    unique_types = session.execute(text("""
-                        SELECT COUNT(DISTINCT a.type) 
-                        FROM attribute a 
-                        JOIN experience_attribute ea ON a.id = ea.attribute_id 
-                        JOIN experience e ON ea.experience_id = e.id 
-                        WHERE e.expert_id = :expert_id
-                    """), {'expert_id': expert.id}).scalar() or 0
-                    
-                    expert_info['stats'] = {
-                        'total_experiences': total_experiences,
-                        'total_attributes': total_attributes,
-                        'unique_attribute_types': unique_types
-                    }
-                
-                expert_data.append(expert_info)
-            
-            # Calculate pagination info
-            total_pages = (total_count + page_size - 1) // page_size
+            total_count = session.scalar(select(func.count()).select_from(Expert).where(*filters))
             
-            return {
-                'experts': expert_data,
-                'pagination': {
-                    'page': page,
-                    'page_size': page_size,
-                    'total_count': total_count,
-                    'total_pages': total_pages,
-                    'has_next': page < total_pages,
-                    'has_prev': page > 1
-                },
-                'search': {
-                    'query': search_name,
-                    'is_filtered': bool(search_name)
-                },
-                'include_experiences': include_experiences
-            }
-        finally:
+            if include_experiences:
+                experts = _iter_experts_with_experiences(session, filters, offset, page_size)
+            else:
+                experts = _iter_experts_with_stats(session, filters, offset, page_size)
+        except Exception:
             session.close()
+            raise
+        
+        # Calculate pagination info
+        total_pages = (total_count + page_size - 1) // page_size
+        
+        response = stream_json_list('experts', experts, fields={
+            'pagination': {
+                'page': page,
+                'page_size': page_size,
+                'total_count': total_count,
+                'total_pages': total_pages,
+                'has_next': page < total_pages,
+                'has_prev': page > 1
+            },
+            'search': {
+                'query': search_name,
+                'is_filtered': bool(search_name)
+            },
+            'include_experiences': include_experiences
+        }, on_complete=lambda body: expert_response_cache.set_body(cache_key, body, cache_version))
+        response.call_on_close(session.close)
+        return response
 
     def post(self):
-        # Delegate to the same implementation as ExpertResource
-        expert_resource = ExpertResource()
-        return expert_resource._create_expert()
\ No newline at end of file
+        return _create_expert()
\ No newline at end of file
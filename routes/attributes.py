@@ -1,74 +1,255 @@
+import json
+import logging
+import numpy as np
 from flask import request
-from flask_restful import Resource
-from models import Attribute, Experience
-from database import get_db_session
+from flask.views import MethodView
+from models import Attribute, Experience, attribute_version, experience_attribute_association
+from database import copy_int_rows, engine, get_db_session, get_readonly_connection
+from lib.response_cache import MISSING, TTLCache, expert_response_cache
+from lib.serialization import json_view
 from lib.embedding_service import embedding_service
-from sqlalchemy import text
+from lib.attribute_index import DEPTH_PENALTY, attribute_index, popularity_boost, rerank
+from config import IN_MEMORY_ATTRIBUTE_SEARCH, RESPONSE_CACHE_TIMEOUT
+from sqlalchemy import bindparam, func, insert, literal_column, select, text, update
 from typing import List, Tuple
 
+logger = logging.getLogger(__name__)
+
+# Attribute search fetches limit * SEARCH_RERANK_FACTOR nearest neighbours
+# from the HNSW index before re-ranking them with the depth penalty and popularity boost
+SEARCH_RERANK_FACTOR = 4
+
+# Page/result size when limit isn't given, and the largest allowed; the
+# maximum keeps limit * SEARCH_RERANK_FACTOR within the ef_search cap of 1000
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# Filtered attribute counts for the list endpoint, keyed by (type, lowercased name,
+# attribute_version) so any process's attribute write starts a new count; the
+# timeout only bounds how long unused entries are kept
+_list_count_cache = TTLCache(RESPONSE_CACHE_TIMEOUT)
+
+# Experience link lists at least this long are written with COPY instead of a multi-row INSERT
+COPY_MIN_ROWS = 100
+
+
+# Nearest-neighbour candidates for attribute similarity search with pgvector.
+# All queries are answered by one statement: the embeddings are unnested and
+# each drives a LATERAL subquery. Extra candidates are fetched and re-ranked
+# with the depth penalty and popularity boost in Python.
+_ATTRIBUTE_SIMILARITY_SQL = """
+    SELECT q.qi, s.*
+    FROM (
+        SELECT CAST(e.v AS vector) AS qv, e.qi
+        FROM json_array_elements_text(CAST(:query_embeddings AS json)) WITH ORDINALITY AS e(v, qi)
+    ) q
+    CROSS JOIN LATERAL (
+        SELECT 
+            id, name, type, summary, depth, parent_id, exp_count,
+            embedding <=> q.qv as distance
+        FROM attribute 
+        WHERE embedding IS NOT NULL{type_clause}
+        ORDER BY {order_by}
+        LIMIT :candidates
+    ) s
+    ORDER BY q.qi
+"""
+
+# Unfiltered search orders by the half-precision distance so
+# ix_attribute_embedding_half_hnsw serves it; the distance column stays exact
+ATTRIBUTE_SIMILARITY_QUERY = text(_ATTRIBUTE_SIMILARITY_SQL.format(
+    type_clause='',
+    order_by='CAST(embedding AS halfvec(1536)) <=> CAST(q.qv AS halfvec(1536))'
+))
+
+# With a type filter the HNSW scan would drop other types only after drawing
+# its candidates from all of them, returning too few rows for sparse types, so
+# the filtered search scans that type's rows and sorts exactly
+TYPED_ATTRIBUTE_SIMILARITY_QUERY = text(_ATTRIBUTE_SIMILARITY_SQL.format(
+    type_clause='\n            AND type = :type_filter',
+    order_by='distance'
+))
+
+
+def _attribute_rows_query(*columns):
+    """
+    Select the given Attribute columns plus an 'experiences' JSON array of linked experience IDs
+
+    The IDs are aggregated in the database in the same statement, instead of
+    lazy loading attribute.experiences once per row.
+    """
+    link = experience_attribute_association
+    experience_ids = func.coalesce(
+        func.json_agg(link.c.experience_id).filter(link.c.experience_id.isnot(None)),
+        literal_column("'[]'::json")
+    ).label('experiences')
+    return (
+        select(*columns, experience_ids)
+        .select_from(Attribute)
+        .outerjoin(link, link.c.attribute_id == Attribute.id)
+        .group_by(Attribute.id)
+    )
+
+
+# Statements built once at import; only per-request filters are added at call time
+ATTRIBUTE_DETAIL_QUERY = _attribute_rows_query(
+    Attribute.id, Attribute.name, Attribute.type, Attribute.summary,
+    Attribute.depth, Attribute.parent_id, Attribute.embedding
+).where(Attribute.id == bindparam('attribute_id'))
+
+ATTRIBUTE_LIST_QUERY = _attribute_rows_query(
+    Attribute.id, Attribute.name, Attribute.type, Attribute.summary, Attribute.embedding
+)
+
+ATTRIBUTE_PAGE_QUERY = _attribute_rows_query(
+    Attribute.id, Attribute.name, Attribute.type, Attribute.summary,
+    Attribute.depth, Attribute.parent_id
+)
+
+SET_HNSW_EF_SEARCH = text("SELECT set_config('hnsw.ef_search', :ef_search, true)")
+
+
+def _link_experiences(session, attribute_id, experience_ids):
+    """
+    Insert experience links for an attribute, switching to COPY for large lists
+
+    Unknown experience IDs are skipped rather than failing the foreign key.
+
+    Returns:
+        The linked experience IDs, in request order
+    """
+    if not experience_ids:
+        return []
+    existing = set(session.scalars(select(Experience.id).where(Experience.id.in_(experience_ids))))
+    experience_ids = [exp_id for exp_id in experience_ids if exp_id in existing]
+    if len(experience_ids) >= COPY_MIN_ROWS:
+        copy_int_rows(session, 'experience_attribute', ('attribute_id', 'experience_id'),
+                      ((attribute_id, exp_id) for exp_id in experience_ids))
+    elif experience_ids:
+        session.execute(
+            experience_attribute_association.insert(),
+            [{'attribute_id': attribute_id, 'experience_id': exp_id} for exp_id in experience_ids]
+        )
+    return experience_ids
+
+
+def _create_attribute(session, data):
+    """
+    Insert an attribute and its experience links with INSERT ... RETURNING
+
+    Core inserts skip the ORM before_insert hook, so the embedding is generated
+    here. Unknown experience IDs are skipped.
+
+    Returns:
+        Response dict for the new attribute (not yet committed)
+    """
+    name, type_str, summary = data.get('name'), data.get('type'), data.get('summary')
+    try:
+        embedding = embedding_service.generate_attribute_embedding(name, type_str, summary)
+    except Exception as e:
+        # Same policy as the model hook: don't fail the insert
+        logger.warning("Failed to generate embedding for attribute %s: %s", name, e)
+        embedding = None
+
+    attribute_id = session.scalar(
+        insert(Attribute)
+        .values(name=name, type=type_str, summary=summary, embedding=embedding)
+        .returning(Attribute.id)
+    )
+
+    experience_ids = _link_experiences(
+        session, attribute_id, list(dict.fromkeys(data.get('experience_ids') or []))
+    )
+
+    return {
+        'id': attribute_id,
+        'name': name,
+        'type': type_str,
+        'summary': summary,
+        'embedding': embedding,
+        'experiences': experience_ids
+    }
+
+
+def _search_attributes_sql(connection, query_embeddings, limit, attribute_type=None):
+    """
+    Rank attributes against each query embedding with pgvector, re-ranked by depth penalty
+
+    The connection must be in a transaction (engine.begin()) so the
+    ef_search setting is discarded when it ends.
+
+    Returns:
+        One result list per query embedding, in input order
+    """
+    candidates = limit * SEARCH_RERANK_FACTOR
+    params = {
+        # pgvector parses the '[...]' text form; json.dumps is much cheaper
+        # than having the driver adapt 1536 floats one by one
+        'query_embeddings': json.dumps(query_embeddings),
+        'candidates': candidates
+    }
+    if attribute_type:
+        query = TYPED_ATTRIBUTE_SIMILARITY_QUERY
+        params['type_filter'] = attribute_type
+    else:
+        query = ATTRIBUTE_SIMILARITY_QUERY
+        # HNSW scans return at most ef_search rows (default 40); widen it so
+        # every candidate can be returned. Local to the transaction, so it
+        # ends with this search instead of sticking to the pooled connection.
+        connection.execute(SET_HNSW_EF_SEARCH, {'ef_search': str(min(max(candidates, 40), 1000))})
+    rows_by_query = [[] for _ in query_embeddings]
+    for row in connection.execute(query, params):
+        rows_by_query[row.qi - 1].append(row)
+
+    results = []
+    for rows in rows_by_query:
+        # The single distance column is turned into both response scores here
+        similarities = 1 - np.fromiter((row.distance for row in rows), dtype=np.float32, count=len(rows))
+        depths = np.fromiter((row.depth or 0 for row in rows), dtype=np.float32, count=len(rows))
+        exp_counts = np.fromiter((row.exp_count or 0 for row in rows), dtype=np.float32, count=len(rows))
+        order, adjusted = rerank(similarities, depths, exp_counts, limit)
+        results.append([
+            {
+                'id': rows[i].id,
+                'name': rows[i].name,
+                'type': rows[i].type,
+                'summary': rows[i].summary,
+                'depth': rows[i].depth or 0,
+                'parent_id': rows[i].parent_id,
+                'similarity_score': float(similarities[i]),
+                'adjusted_score': float(adjusted[i]),
+                'depth_penalty': float(DEPTH_PENALTY * depths[i]),
+                'popularity_boost': float(popularity_boost(exp_counts[i]))
+            } for i in order
+        ])
+    return results
+
+
+class AttributeResource(MethodView):
+    decorators = [json_view]
 
-class AttributeResource(Resource):
     def get(self, attribute_id=None):
-        session = get_db_session()
-        try:
+        with get_readonly_connection() as connection:
             if attribute_id:
-                attribute = session.query(Attribute).filter(Attribute.id == attribute_id).first()
+                attribute = connection.execute(
+                    ATTRIBUTE_DETAIL_QUERY, {'attribute_id': attribute_id}
+                ).mappings().first()
                 if not attribute:
                     return {'message': 'Attribute not found'}, 404
-                return {
-                    'id': attribute.id,
-                    'name': attribute.name,
-                    'type': attribute.type,
-                    'summary': attribute.summary,
-                    'depth': attribute.depth,
-                    'parent_id': attribute.parent_id,
-                    'embedding': attribute.embedding,
-                    'experiences': [exp.id for exp in attribute.experiences]
-                }
+                return dict(attribute)
             else:
-                attributes = session.query(Attribute).all()
                 return {
-                    'attributes': [
-                        {
-                            'id': attr.id,
-                            'name': attr.name,
-                            'type': attr.type,
-                            'summary': attr.summary,
-                            'embedding': attr.embedding,
-                            'experiences': [exp.id for exp in attr.experiences]
-                        } for attr in attributes
-                    ]
+                    'attributes': [dict(row) for row in connection.execute(ATTRIBUTE_LIST_QUERY).mappings()]
                 }
-        finally:
-            session.close()
 
     def post(self):
         session = get_db_session()
         try:
-            data = request.get_json()
-            
-            attribute = Attribute(
-                name=data.get('name'),
-                type=data.get('type'),
-                summary=data.get('summary')
-            )
-            
-            # Handle experience associations if provided
-            experience_ids = data.get('experience_ids', [])
-            if experience_ids:
-                experiences = session.query(Experience).filter(Experience.id.in_(experience_ids)).all()
-                attribute.experiences = experiences
-            
-            session.add(attribute)
+            attribute = _create_attribute(session, request.get_json())
             session.commit()
-            return {
-                'id': attribute.id,
-                'name': attribute.name,
-                'type': attribute.type,
-                'summary': attribute.summary,
-                'embedding': attribute.embedding,
-                'experiences': [exp.id for exp in attribute.experiences]
-            }, 201
+            expert_response_cache.invalidate()
+            attribute_index.invalidate()
+            return attribute, 201
         except Exception as e:
             session.rollback()
             return {'message': str(e)}, 400
@@ -78,30 +259,51 @@ class AttributeResource(Resource):
     def put(self, attribute_id):
         session = get_db_session()
         try:
-            attribute = session.query(Attribute).filter(Attribute.id == attribute_id).first()
-            if not attribute:
+            current = session.execute(
+                select(Attribute.name, Attribute.type, Attribute.summary).where(Attribute.id == attribute_id)
+            ).first()
+            if not current:
                 return {'message': 'Attribute not found'}, 404
             
             data = request.get_json()
-            attribute.name = data.get('name', attribute.name)
-            attribute.type = data.get('type', attribute.type)
-            attribute.summary = data.get('summary', attribute.summary)
+            values = {
+                'name': data.get('name', current.name),
+                'type': data.get('type', current.type),
+                'summary': data.get('summary', current.summary)
+            }
+            # Core updates skip the before_update hook, so regenerate the embedding
+            # here when the embedded text changes
+            if (values['name'], values['type'], values['summary']) != tuple(current):
+                try:
+                    values['embedding'] = embedding_service.generate_attribute_embedding(
+                        values['name'], values['type'], values['summary']
+                    )
+                except Exception as e:
+                    logger.warning("Failed to update embedding for attribute %s: %s", values['name'], e)
+            
+            attribute = session.execute(
+                update(Attribute)
+                .where(Attribute.id == attribute_id)
+                .values(**values)
+                .returning(Attribute.id, Attribute.name, Attribute.type, Attribute.summary, Attribute.embedding)
+            ).mappings().one()
             
             # Handle experience associations if provided
+            link = experience_attribute_association
             if 'experience_ids' in data:
-                experience_ids = data.get('experience_ids', [])
-                experiences = session.query(Experience).filter(Experience.id.in_(experience_ids)).all()
-                attribute.experiences = experiences
+                session.execute(link.delete().where(link.c.attribute_id == attribute_id))
+                experience_ids = _link_experiences(
+                    session, attribute_id, list(dict.fromkeys(data.get('experience_ids') or []))
+                )
+            else:
+                experience_ids = session.scalars(
+                    select(link.c.experience_id).where(link.c.attribute_id == attribute_id)
+                ).all()
             
             session.commit()
-            return {
-                'id': attribute.id,
-                'name': attribute.name,
-                'type': attribute.type,
-                'summary': attribute.summary,
-                'embedding': attribute.embedding,
-                'experiences': [exp.id for exp in attribute.experiences]
-            }
+            expert_response_cache.invalidate()
+            attribute_index.invalidate()
+            return {**attribute, 'experiences': experience_ids}
         except Exception as e:
             session.rollback()
             return {'message': str(e)}, 400
@@ -117,6 +319,8 @@ class AttributeResource(Resource):
             
             session.delete(attribute)
             session.commit()
+            expert_response_cache.invalidate()
+            attribute_index.invalidate()
             return {'message': 'Attribute deleted successfully'}
         except Exception as e:
             session.rollback()
@@ -125,131 +329,79 @@ class AttributeResource(Resource):
             session.close()
 
 
-class AttributeListResource(Resource):
+class AttributeListResource(MethodView):
+    decorators = [json_view]
+
     def get(self):
-        session = get_db_session()
-        try:
-            # Check for search query parameter
-            search_query = request.args.get('q')
-            attribute_type = request.args.get('type')
-            limit = request.args.get('limit', 50, type=int)
+        # Check for search query parameter; repeat q (?q=a&q=b) to search several at once
+        search_queries = request.args.getlist('q')
+        attribute_type = request.args.get('type')
+        attribute_name = request.args.get('name')
+        limit = max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+        
+        if search_queries:
+            # Generate embeddings for all search queries in one API call
+            try:
+                query_embeddings = embedding_service.generate_query_embeddings(search_queries)
+            except Exception as e:
+                return {'message': f'Failed to generate embedding: {str(e)}'}, 400
             
-            if search_query:
-                # Generate embedding for the search query
-                try:
-                    import time
-                    start_time = time.time()
-                    query_embedding = embedding_service.generate_embedding(search_query)
-                    embedding_time = time.time() - start_time
-                    print(f"🔍 Embedding generation took: {embedding_time:.3f}s")
-                except Exception as e:
-                    return {'message': f'Failed to generate embedding: {str(e)}'}, 400
-                
-                # Use pgvector cosine similarity directly in SQL with depth penalty
-                # This is much more efficient than loading all records into Python
-                
-                # Build base query with type filter if provided
-                type_filter = "AND type = :type_filter" if attribute_type else ""
-                
-                # SQL query using pgvector cosine similarity with depth penalty
-                similarity_query = text(f"""
-                    SELECT 
-                        id, name, type, summary, depth, parent_id,
-                        (1 - (embedding <=> CAST(:query_embedding AS vector))) as similarity_score,
-                        (1 - (embedding <=> CAST(:query_embedding AS vector))) - (0.01 * COALESCE(depth, 0)) as adjusted_score
-                    FROM attribute 
-                    WHERE embedding IS NOT NULL {type_filter}
-                    ORDER BY adjusted_score DESC 
-                    LIMIT :limit
-                """)
-                
-                params = {
-                    'query_embedding': query_embedding,
-                    'limit': limit
-                }
-                if attribute_type:
-                    params['type_filter'] = attribute_type
-                
-                result = session.execute(similarity_query, params)
-                rows = result.fetchall()
-                
-                # Skip count query for performance - use number of results found
-                total_count = len(rows)
-                
-                return {
-                    'query': search_query,
-                    'type_filter': attribute_type,
-                    'total_found': total_count,
-                    'attributes': [
-                        {
-                            'id': row.id,
-                            'name': row.name,
-                            'type': row.type,
-                            'summary': row.summary,
-                            'depth': row.depth or 0,
-                            'parent_id': row.parent_id,
-                            'similarity_score': float(row.similarity_score),
-                            'adjusted_score': float(row.adjusted_score),
-                            'depth_penalty': float(0.01 * (row.depth or 0))
-                        } for row in rows
-                    ]
-                }
+            if IN_MEMORY_ATTRIBUTE_SEARCH:
+                results = attribute_index.search_many(query_embeddings, limit, attribute_type)
             else:
-                # Regular listing without search
-                query = session.query(Attribute)
-                if attribute_type:
-                    query = query.filter(Attribute.type == attribute_type)
-                
-                # Get total count with same filters
-                total_count = query.count()
-                
-                attributes = query.limit(limit).all()
-                return {
-                    'total_count': total_count,
-                    'limit': limit,
+                with engine.begin() as connection:
+                    results = _search_attributes_sql(connection, query_embeddings, limit, attribute_type)
+            
+            responses = [
+                {
+                    'query': search_query,
                     'type_filter': attribute_type,
-                    'attributes': [
-                        {
-                            'id': attr.id,
-                            'name': attr.name,
-                            'type': attr.type,
-                            'summary': attr.summary,
-                            'depth': attr.depth,
-                            'parent_id': attr.parent_id,
-                            'experiences': [exp.id for exp in attr.experiences]
-                        } for attr in attributes
-                    ]
-                }
-        finally:
-            session.close()
+                    # Skip count query for performance - use number of results found
+                    'total_found': len(attributes),
+                    'attributes': attributes
+                } for search_query, attributes in zip(search_queries, results)
+            ]
+            if len(responses) == 1:
+                return responses[0]
+            return {'results': responses}
+        
+        # Regular listing without search, paginated by ID (keyset); the count
+        # over the filtered set is cached rather than recomputed for every page
+        after = request.args.get('after', 0, type=int)
+        filters = []
+        if attribute_type:
+            filters.append(Attribute.type == attribute_type)
+        if attribute_name:
+            # Case-insensitive exact match served by the name_lower index
+            filters.append(Attribute.name_lower == attribute_name.lower())
+        
+        with get_readonly_connection() as connection:
+            rows = connection.execute(
+                ATTRIBUTE_PAGE_QUERY.where(Attribute.id > after, *filters).order_by(Attribute.id).limit(limit)
+            ).mappings().all()
+            count_key = (attribute_type, attribute_name and attribute_name.lower(),
+                         connection.scalar(select(attribute_version.c.version)))
+            total_count = _list_count_cache.get(count_key)
+            if total_count is MISSING:
+                total_count = connection.scalar(select(func.count()).select_from(Attribute).where(*filters))
+                _list_count_cache.set(count_key, total_count)
+        return {
+            'total_count': total_count,
+            'limit': limit,
+            'type_filter': attribute_type,
+            # Pass as ?after= to fetch the next page; None on the last page
+            'next_cursor': rows[-1]['id'] if rows and len(rows) == limit else None,
+            'attributes': [dict(row) for row in rows]
+        }
 
     def post(self):
         session = get_db_session()
         try:
-            data = request.get_json()
-            
-            attribute = Attribute(
-                name=data.get('name'),
-                type=data.get('type'),
-                summary=data.get('summary')
-            )
-            
-            # Handle experience associations if provided
-            experience_ids = data.get('experience_ids', [])
-            if experience_ids:
-                experiences = session.query(Experience).filter(Experience.id.in_(experience_ids)).all()
-                attribute.experiences = experiences
-            
-            session.add(attribute)
+            attribute = _create_attribute(session, request.get_json())
             session.commit()
-            return {
-                'id': attribute.id,
-                'name': attribute.name,
-                'type': attribute.type,
-                'summary': attribute.summary,
-                'embedding': attribute.embedding,
-                'experiences': [exp.id for exp in attribute.experiences]
-            }, 201
+            expert_response_cache.invalidate()
+            attribute_index.invalidate()
+            return attribute, 201
         except Exception as e:
             session.rollback()
             return {'message': str(e)}, 400
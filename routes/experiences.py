@@ -1,72 +1,95 @@
 from flask import request
-from flask_restful import Resource
+from flask.views import MethodView
 from models import Experience, Expert
-from database import get_db_session
-from datetime import datetime
+from database import get_db_session, get_readonly_connection
+from lib.response_cache import expert_response_cache
+from lib.serialization import json_view, stream_json_list
+from lib.dates import parse_date
+from sqlalchemy import exists, func, insert, select, text, update
+
+# One experience with its attributes, shaped for the response by the database
+EXPERIENCE_DETAIL_QUERY = text("""
+    SELECT
+        e.id, e.expert_id,
+        to_char(e.start_date, 'YYYY-MM-DD') AS start_date,
+        to_char(e.end_date, 'YYYY-MM-DD') AS end_date,
+        e.summary,
+        COALESCE(
+            json_agg(json_build_object('id', a.id, 'name', a.name, 'type', a.type, 'summary', a.summary))
+                FILTER (WHERE a.id IS NOT NULL),
+            '[]'
+        ) AS attributes
+    FROM experience e
+    LEFT JOIN experience_attribute ea ON ea.experience_id = e.id
+    LEFT JOIN attribute a ON a.id = ea.attribute_id
+    WHERE e.id = :experience_id
+    GROUP BY e.id
+""")
+
+
+# Experience list columns with dates already formatted as ISO strings
+EXPERIENCE_ROWS_QUERY = select(
+    Experience.id,
+    Experience.expert_id,
+    func.to_char(Experience.start_date, 'YYYY-MM-DD').label('start_date'),
+    func.to_char(Experience.end_date, 'YYYY-MM-DD').label('end_date'),
+    Experience.summary
+)
+
+
+def _create_experience(session, data):
+    """
+    Insert an experience with INSERT ... RETURNING
+
+    Returns:
+        Response dict for the new experience (not yet committed), or None if the expert doesn't exist
+    """
+    if not session.scalar(select(exists().where(Expert.id == data.get('expert_id')))):
+        return None
+
+    values = {
+        'expert_id': data.get('expert_id'),
+        'start_date': parse_date(data.get('start_date')),
+        'end_date': parse_date(data.get('end_date')),
+        'summary': data.get('summary')
+    }
+    experience_id = session.scalar(insert(Experience).values(**values).returning(Experience.id))
+    return {
+        'id': experience_id,
+        'expert_id': values['expert_id'],
+        'start_date': values['start_date'].isoformat(),
+        'end_date': values['end_date'].isoformat(),
+        'summary': values['summary']
+    }
+
+class ExperienceResource(MethodView):
+    decorators = [json_view]
 
-class ExperienceResource(Resource):
     def get(self, experience_id=None):
-        session = get_db_session()
-        try:
+        with get_readonly_connection() as connection:
             if experience_id:
-                experience = session.query(Experience).filter(Experience.id == experience_id).first()
+                experience = connection.execute(
+                    EXPERIENCE_DETAIL_QUERY, {'experience_id': experience_id}
+                ).mappings().first()
                 if not experience:
                     return {'message': 'Experience not found'}, 404
-                return {
-                    'id': experience.id,
-                    'expert_id': experience.expert_id,
-                    'start_date': experience.start_date.isoformat(),
-                    'end_date': experience.end_date.isoformat(),
-                    'summary': experience.summary,
-                    'attributes': [
-                        {
-                            'id': attr.id,
-                            'name': attr.name,
-                            'type': attr.type,
-                            'summary': attr.summary
-                        } for attr in experience.attributes
-                    ]
-                }
+                return dict(experience)
             else:
-                experiences = session.query(Experience).all()
+                rows = connection.execute(EXPERIENCE_ROWS_QUERY).mappings()
                 return {
-                    'experiences': [
-                        {
-                            'id': exp.id,
-                            'expert_id': exp.expert_id,
-                            'start_date': exp.start_date.isoformat(),
-                            'end_date': exp.end_date.isoformat(),
-                            'summary': exp.summary
-                        } for exp in experiences
-                    ]
+                    'experiences': [dict(row) for row in rows]
                 }
-        finally:
-            session.close()
 
     def post(self):
         session = get_db_session()
         try:
-            data = request.get_json()
-            
-            expert = session.query(Expert).filter(Expert.id == data.get('expert_id')).first()
-            if not expert:
+            experience = _create_experience(session, request.get_json())
+            if experience is None:
                 return {'message': 'Expert not found'}, 404
             
-            experience = Experience(
-                expert_id=data.get('expert_id'),
-                start_date=datetime.fromisoformat(data.get('start_date')).date(),
-                end_date=datetime.fromisoformat(data.get('end_date')).date(),
-                summary=data.get('summary')
-            )
-            session.add(experience)
             session.commit()
-            return {
-                'id': experience.id,
-                'expert_id': experience.expert_id,
-                'start_date': experience.start_date.isoformat(),
-                'end_date': experience.end_date.isoformat(),
-                'summary': experience.summary
-            }, 201
+            expert_response_cache.invalidate()
+            return experience, 201
         except Exception as e:
             session.rollback()
             return {'message': str(e)}, 400
@@ -76,18 +99,27 @@ class ExperienceResource(Resource):
     def put(self, experience_id):
         session = get_db_session()
         try:
-            experience = session.query(Experience).filter(Experience.id == experience_id).first()
-            if not experience:
-                return {'message': 'Experience not found'}, 404
-            
             data = request.get_json()
+            # Unspecified fields are set to themselves, so one UPDATE ... RETURNING
+            # both applies the change and reads back the full row
+            values = {'summary': data.get('summary', Experience.summary)}
             if data.get('start_date'):
-                experience.start_date = datetime.fromisoformat(data.get('start_date')).date()
+                values['start_date'] = parse_date(data.get('start_date'))
             if data.get('end_date'):
-                experience.end_date = datetime.fromisoformat(data.get('end_date')).date()
-            experience.summary = data.get('summary', experience.summary)
+                values['end_date'] = parse_date(data.get('end_date'))
+            
+            experience = session.execute(
+                update(Experience)
+                .where(Experience.id == experience_id)
+                .values(**values)
+                .returning(Experience.id, Experience.expert_id, Experience.start_date,
+                           Experience.end_date, Experience.summary)
+            ).first()
+            if not experience:
+                return {'message': 'Experience not found'}, 404
             
             session.commit()
+            expert_response_cache.invalidate()
             return {
                 'id': experience.id,
                 'expert_id': experience.expert_id,
@@ -110,6 +142,7 @@ class ExperienceResource(Resource):
             
             session.delete(experience)
             session.commit()
+            expert_response_cache.invalidate()
             return {'message': 'Experience deleted successfully'}
         except Exception as e:
             session.rollback()
@@ -117,49 +150,36 @@ class ExperienceResource(Resource):
         finally:
             session.close()
 
-class ExperienceListResource(Resource):
+class ExperienceListResource(MethodView):
+    decorators = [json_view]
+
     def get(self):
+        # Unpaginated listing: stream rows in batches instead of building the whole list.
+        # Uses a session, not the autocommit connection: server-side cursors need a transaction.
         session = get_db_session()
         try:
-            experiences = session.query(Experience).all()
-            return {
-                'experiences': [
-                    {
-                        'id': exp.id,
-                        'expert_id': exp.expert_id,
-                        'start_date': exp.start_date.isoformat(),
-                        'end_date': exp.end_date.isoformat(),
-                        'summary': exp.summary
-                    } for exp in experiences
-                ]
-            }
-        finally:
+            experiences = (
+                dict(row) for row in session.execute(
+                    EXPERIENCE_ROWS_QUERY.execution_options(yield_per=500)
+                ).mappings()
+            )
+            response = stream_json_list('experiences', experiences)
+        except Exception:
             session.close()
+            raise
+        response.call_on_close(session.close)
+        return response
 
     def post(self):
         session = get_db_session()
         try:
-            data = request.get_json()
-            
-            expert = session.query(Expert).filter(Expert.id == data.get('expert_id')).first()
-            if not expert:
+            experience = _create_experience(session, request.get_json())
+            if experience is None:
                 return {'message': 'Expert not found'}, 404
             
-            experience = Experience(
-                expert_id=data.get('expert_id'),
-                start_date=datetime.fromisoformat(data.get('start_date')).date(),
-                end_date=datetime.fromisoformat(data.get('end_date')).date(),
-                summary=data.get('summary')
-            )
-            session.add(experience)
             session.commit()
-            return {
-                'id': experience.id,
-                'expert_id': experience.expert_id,
-                'start_date': experience.start_date.isoformat(),
-                'end_date': experience.end_date.isoformat(),
-                'summary': experience.summary
-            }, 201
+            expert_response_cache.invalidate()
+            return experience, 201
         except Exception as e:
             session.rollback()
             return {'message': str(e)}, 400
@@ -1,62 +1,192 @@
-from flask import request
-from flask_restful import Resource
+from flask import request, url_for
+from flask.views import MethodView
 from models import Prompt
-from database import get_db_session
+from database import get_db_session, get_readonly_connection
+from lib.response_cache import prompt_response_cache
+from lib.serialization import json_view, loads, row_serializer
 from datetime import datetime
+from sqlalchemy import JSON, Integer, and_, bindparam, case, or_, select, text, update
+import base64
 import json
 
-class PromptListResource(Resource):
+# Prompt list page size when page_limit isn't given, and the largest allowed
+DEFAULT_PAGE_LIMIT = 64
+MAX_PAGE_LIMIT = 500
+
+# Browser-facing views must revalidate (cheap 304s via the ETag) so edits show up
+# immediately; the active-template lookup polled by the extractor may be reused briefly
+UI_CACHE_CONTROL = 'no-cache'
+TEMPLATE_CACHE_CONTROL = 'max-age=60, stale-while-revalidate=30'
+
+# Transaction-scoped lock on one template's version sequence
+LOCK_TEMPLATE = text("SELECT pg_advisory_xact_lock(hashtext(:template_name))")
+
+# Deactivate the current version (when the new one is active), compute the next
+# version number and insert the new version, all in one statement
+CREATE_PROMPT_VERSION = text("""
+    WITH deactivated AS (
+        UPDATE prompt SET is_active_version = false
+        WHERE template_name = :template_name
+            AND is_active_version = true
+            AND :is_active_version
+        RETURNING id
+    )
+    INSERT INTO prompt (
+        template_name, version_number, prompt_type, system_prompt, user_prompt_template,
+        response_schema, description, model, temperature, enable_attribute_search,
+        created_by, is_active_version, is_default, version_notes, created_at, updated_at
+    )
+    SELECT
+        :template_name, COALESCE(MAX(version_number), 0) + 1, :prompt_type, :system_prompt, :user_prompt_template,
+        :response_schema, :description, :model, :temperature, :enable_attribute_search,
+        :created_by, :is_active_version, :is_default, :version_notes, :created_at, :updated_at
+    FROM prompt
+    WHERE template_name = :template_name
+    RETURNING id, version_number
+""").bindparams(bindparam('response_schema', type_=JSON))
+
+# Fields of the prompt list items and of the single-prompt view, in output order
+_PROMPT_LIST_KEYS = (
+    'id', 'template_name', 'version_number', 'prompt_type', 'description', 'model', 'temperature',
+    'enable_attribute_search', 'is_active_version', 'is_default', 'version_notes',
+    'created_at', 'updated_at', 'created_by'
+)
+_PROMPT_DETAIL_KEYS = (
+    'id', 'template_name', 'version_number', 'prompt_type', 'system_prompt', 'user_prompt_template',
+    'response_schema', 'description', 'model', 'temperature', 'enable_attribute_search',
+    'is_active_version', 'is_default', 'version_notes', 'created_at', 'updated_at', 'created_by'
+)
+_PROMPT_LIST_COLUMNS = [getattr(Prompt, key) for key in _PROMPT_LIST_KEYS]
+
+PROMPT_DETAIL_QUERY = select(*[getattr(Prompt, key) for key in _PROMPT_DETAIL_KEYS]).where(
+    Prompt.id == bindparam('prompt_id')
+)
+ACTIVE_PROMPT_QUERY = select(
+    Prompt.template_name, Prompt.version_number, Prompt.system_prompt, Prompt.user_prompt_template,
+    Prompt.response_schema, Prompt.description, Prompt.model, Prompt.temperature,
+    Prompt.enable_attribute_search
+).where(Prompt.template_name == bindparam('template_name'), Prompt.is_active_version == True).limit(1)
+
+_activate_id = bindparam('prompt_id', type_=Integer)
+ACTIVATE_PROMPT_VERSION = update(Prompt).where(
+    Prompt.template_name == select(Prompt.template_name).where(Prompt.id == _activate_id).scalar_subquery(),
+    or_(Prompt.is_active_version == True, Prompt.id == _activate_id)
+).values(
+    is_active_version=(Prompt.id == _activate_id),
+    updated_at=case((Prompt.id == _activate_id, bindparam('now')), else_=Prompt.updated_at)
+).returning(Prompt.id, Prompt.template_name, Prompt.version_number, Prompt.is_active_version)
+
+
+def _parse_response_schema(value):
+    """
+    Parse and check a response_schema from request data
+
+    The schema is passed to OpenAI as a structured-output json_schema, which
+    must describe a JSON object; catching other shapes here keeps them out of
+    the table instead of failing at extraction time.
+
+    Returns:
+        (schema or None, error message or None)
+    """
+    if not value:
+        return None, None
+    if isinstance(value, str):
+        try:
+            value = loads(value)
+        except json.JSONDecodeError:
+            return None, 'Invalid JSON in response_schema'
+    if not isinstance(value, dict) or value.get('type', 'object') != 'object':
+        return None, 'response_schema must be a JSON schema object with type "object"'
+    return value, None
+
+
+# Response dicts for list and detail rows; timestamps are left as datetimes for
+# dumps() to encode. The legacy name/version/is_active fields keep older clients working.
+_PROMPT_LEGACY_FIELDS = {
+    'name': 'template_name',
+    'version': 'str(version_number)',
+    'is_active': 'is_active_version'
+}
+_serialize_prompt = row_serializer('prompt', _PROMPT_LIST_KEYS, _PROMPT_LEGACY_FIELDS)
+_serialize_prompt_detail = row_serializer('prompt_detail', _PROMPT_DETAIL_KEYS, _PROMPT_LEGACY_FIELDS)
+
+
+def _encode_cursor(prompt):
+    """Opaque keyset cursor for the list position just after this prompt"""
+    key = [prompt.template_name, prompt.version_number, prompt.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    """Inverse of _encode_cursor; raises ValueError/TypeError on malformed input"""
+    template_name, version_number, prompt_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return str(template_name), int(version_number), int(prompt_id)
+
+
+class PromptListResource(MethodView):
+    decorators = [json_view]
+
     def get(self):
         """List all prompt templates with their active versions, or all versions if show_all_versions=true"""
-        session = get_db_session()
-        try:
-            # Get query parameters
-            prompt_type = request.args.get('type')
-            show_all_versions = request.args.get('show_all_versions', 'false').lower() in ('true', '1', 'yes')
-            template_name = request.args.get('template_name')
-            
-            # Build query
-            query = session.query(Prompt)
-            
-            if prompt_type:
-                query = query.filter(Prompt.prompt_type == prompt_type)
-            
-            if template_name:
-                query = query.filter(Prompt.template_name == template_name)
-            
-            if not show_all_versions:
-                # Only show active versions by default
-                query = query.filter(Prompt.is_active_version == True)
-            
-            # Order by template name, then by version number descending
-            prompts = query.order_by(Prompt.template_name, Prompt.version_number.desc()).all()
-            
-            return {
-                'prompts': [
-                    {
-                        'id': prompt.id,
-                        'template_name': prompt.template_name,
-                        'version_number': prompt.version_number,
-                        'prompt_type': prompt.prompt_type,
-                        'description': prompt.description,
-                        'model': prompt.model,
-                        'temperature': prompt.temperature,
-                        'enable_attribute_search': prompt.enable_attribute_search,
-                        'is_active_version': prompt.is_active_version,
-                        'is_default': prompt.is_default,
-                        'version_notes': prompt.version_notes,
-                        'created_at': prompt.created_at.isoformat(),
-                        'updated_at': prompt.updated_at.isoformat(),
-                        'created_by': prompt.created_by,
-                        # Legacy fields for backward compatibility
-                        'name': prompt.name,
-                        'version': prompt.version,
-                        'is_active': prompt.is_active
-                    } for prompt in prompts
-                ]
-            }
-        finally:
-            session.close()
+        cache_key = ('list', tuple(sorted(request.args.items(multi=True))))
+        cached = prompt_response_cache.get(cache_key)
+        if cached is not None:
+            return cached.to_response(UI_CACHE_CONTROL)
+        cache_version = prompt_response_cache.version
+        
+        # Get query parameters
+        prompt_type = request.args.get('type')
+        show_all_versions = request.args.get('show_all_versions', 'false').lower() in ('true', '1', 'yes')
+        template_name = request.args.get('template_name')
+        page_limit = max(1, min(request.args.get('page_limit', DEFAULT_PAGE_LIMIT, type=int), MAX_PAGE_LIMIT))
+        page_after = request.args.get('page_after')
+        
+        # Build query over just the listed columns; the prompt bodies and
+        # response_schema are only returned by the single-prompt view
+        query = select(*_PROMPT_LIST_COLUMNS)
+        
+        if prompt_type:
+            query = query.where(Prompt.prompt_type == prompt_type)
+        
+        if template_name:
+            query = query.where(Prompt.template_name == template_name)
+        
+        if not show_all_versions:
+            # Only show active versions by default
+            query = query.where(Prompt.is_active_version == True)
+        
+        if page_after:
+            # Keyset pagination: resume after the cursor row in the list order
+            try:
+                after_name, after_version, after_id = _decode_cursor(page_after)
+            except (ValueError, TypeError):
+                return {'message': 'Invalid page_after cursor'}, 400
+            query = query.where(or_(
+                Prompt.template_name > after_name,
+                and_(Prompt.template_name == after_name, Prompt.version_number < after_version),
+                and_(Prompt.template_name == after_name, Prompt.version_number == after_version,
+                     Prompt.id > after_id)
+            ))
+        
+        # Order by template name, then by version number descending; fetch one
+        # extra row to learn whether there is a next page
+        query = query.order_by(
+            Prompt.template_name, Prompt.version_number.desc(), Prompt.id
+        ).limit(page_limit + 1)
+        with get_readonly_connection() as connection:
+            prompts = connection.execute(query).all()
+        
+        next_url = None
+        if len(prompts) > page_limit:
+            prompts = prompts[:page_limit]
+            args = request.args.to_dict()
+            args['page_after'] = _encode_cursor(prompts[-1])
+            next_url = url_for(request.endpoint, **args)
+        
+        return prompt_response_cache.set(cache_key, {
+            'links': {'next': next_url},
+            'prompts': [_serialize_prompt(prompt) for prompt in prompts]
+        }, cache_version).to_response(UI_CACHE_CONTROL)
     
     def post(self):
         """Create a new prompt version"""
@@ -71,56 +201,44 @@ class PromptListResource(Resource):
                     return {'message': f'Missing required field: {field}'}, 400
             
             # Validate response_schema if provided
-            response_schema = data.get('response_schema')
-            if response_schema and isinstance(response_schema, str):
-                try:
-                    response_schema = json.loads(response_schema)
-                except json.JSONDecodeError:
-                    return {'message': 'Invalid JSON in response_schema'}, 400
+            response_schema, error = _parse_response_schema(data.get('response_schema'))
+            if error:
+                return {'message': error}, 400
             
-            # Determine next version number
             template_name = data['template_name']
-            latest_version = session.query(Prompt).filter(
-                Prompt.template_name == template_name
-            ).order_by(Prompt.version_number.desc()).first()
-            
-            next_version = 1 if not latest_version else latest_version.version_number + 1
-            
-            # If this is set as active, deactivate other versions
             is_active_version = bool(data.get('is_active_version', data.get('is_active', True)))
-            if is_active_version:
-                session.query(Prompt).filter(
-                    Prompt.template_name == template_name,
-                    Prompt.is_active_version == True
-                ).update({'is_active_version': False})
-            
-            # Create new prompt version
-            prompt = Prompt(
-                template_name=template_name,
-                version_number=next_version,
-                prompt_type=data['prompt_type'],
-                system_prompt=data['system_prompt'],
-                user_prompt_template=data['user_prompt_template'],
-                response_schema=response_schema,
-                description=data.get('description'),
-                model=data.get('model', 'gpt-4o-mini'),
-                temperature=float(data.get('temperature', 0.1)),
-                enable_attribute_search=bool(data.get('enable_attribute_search', False)),
-                created_by=data.get('created_by', 'user'),
-                is_active_version=is_active_version,
-                is_default=bool(data.get('is_default', False)),
-                version_notes=data.get('version_notes')
-            )
+            now = datetime.utcnow()
+            params = {
+                'template_name': template_name,
+                'prompt_type': data['prompt_type'],
+                'system_prompt': data['system_prompt'],
+                'user_prompt_template': data['user_prompt_template'],
+                'response_schema': response_schema,
+                'description': data.get('description'),
+                'model': data.get('model', 'gpt-4o-mini'),
+                'temperature': float(data.get('temperature', 0.1)),
+                'enable_attribute_search': bool(data.get('enable_attribute_search', False)),
+                'created_by': data.get('created_by', 'user'),
+                'is_active_version': is_active_version,
+                'is_default': bool(data.get('is_default', False)),
+                'version_notes': data.get('version_notes'),
+                'created_at': now,
+                'updated_at': now
+            }
             
-            session.add(prompt)
+            # Serialize version creation per template so two concurrent posts
+            # can't both compute the same next version number
+            session.execute(LOCK_TEMPLATE, {'template_name': template_name})
+            prompt = session.execute(CREATE_PROMPT_VERSION, params).one()
             session.commit()
+            prompt_response_cache.invalidate()
             
             return {
                 'id': prompt.id,
-                'template_name': prompt.template_name,
+                'template_name': template_name,
                 'version_number': prompt.version_number,
-                'prompt_type': prompt.prompt_type,
-                'is_active_version': prompt.is_active_version,
+                'prompt_type': params['prompt_type'],
+                'is_active_version': is_active_version,
                 'message': 'Prompt version created successfully'
             }, 201
             
@@ -132,26 +250,26 @@ class PromptListResource(Resource):
         finally:
             session.close()
 
-class PromptVersionActivateResource(Resource):
+class PromptVersionActivateResource(MethodView):
+    decorators = [json_view]
+
     def post(self, prompt_id):
         """Activate a specific prompt version"""
         session = get_db_session()
         try:
-            prompt = session.query(Prompt).filter(Prompt.id == prompt_id).first()
+            # Flip every active sibling off and the target on in one statement; the
+            # target's row comes back through RETURNING
+            rows = session.execute(
+                ACTIVATE_PROMPT_VERSION,
+                {'prompt_id': prompt_id, 'now': datetime.utcnow()},
+                execution_options={'synchronize_session': False}
+            ).all()
+            prompt = next((row for row in rows if row.id == prompt_id), None)
             if not prompt:
                 return {'message': 'Prompt version not found'}, 404
             
-            # Deactivate all other versions of this template
-            session.query(Prompt).filter(
-                Prompt.template_name == prompt.template_name,
-                Prompt.is_active_version == True
-            ).update({'is_active_version': False})
-            
-            # Activate this version
-            prompt.is_active_version = True
-            prompt.updated_at = datetime.utcnow()
-            
             session.commit()
+            prompt_response_cache.invalidate()
             
             return {
                 'id': prompt.id,
@@ -167,46 +285,31 @@ class PromptVersionActivateResource(Resource):
         finally:
             session.close()
 
-class PromptResource(Resource):
+class PromptResource(MethodView):
+    decorators = [json_view]
+
     def get(self, prompt_id):
         """Get a specific prompt by ID"""
-        session = get_db_session()
-        try:
-            prompt = session.query(Prompt).filter(Prompt.id == prompt_id).first()
-            if not prompt:
-                return {'message': 'Prompt not found'}, 404
-            
-            return {
-                'id': prompt.id,
-                'template_name': prompt.template_name,
-                'version_number': prompt.version_number,
-                'prompt_type': prompt.prompt_type,
-                'system_prompt': prompt.system_prompt,
-                'user_prompt_template': prompt.user_prompt_template,
-                'response_schema': prompt.response_schema,
-                'description': prompt.description,
-                'model': prompt.model,
-                'temperature': prompt.temperature,
-                'enable_attribute_search': prompt.enable_attribute_search,
-                'is_active_version': prompt.is_active_version,
-                'is_default': prompt.is_default,
-                'version_notes': prompt.version_notes,
-                'created_at': prompt.created_at.isoformat(),
-                'updated_at': prompt.updated_at.isoformat(),
-                'created_by': prompt.created_by,
-                # Legacy fields for backward compatibility
-                'name': prompt.name,
-                'version': prompt.version,
-                'is_active': prompt.is_active
-            }
-        finally:
-            session.close()
+        cache_key = ('detail', prompt_id)
+        cached = prompt_response_cache.get(cache_key)
+        if cached is not None:
+            return cached.to_response(UI_CACHE_CONTROL)
+        cache_version = prompt_response_cache.version
+        
+        with get_readonly_connection() as connection:
+            prompt = connection.execute(PROMPT_DETAIL_QUERY, {'prompt_id': prompt_id}).first()
+        if not prompt:
+            return {'message': 'Prompt not found'}, 404
+        
+        return prompt_response_cache.set(
+            cache_key, _serialize_prompt_detail(prompt), cache_version
+        ).to_response(UI_CACHE_CONTROL)
     
     def put(self, prompt_id):
         """Update an existing prompt"""
         session = get_db_session()
         try:
-            prompt = session.query(Prompt).filter(Prompt.id == prompt_id).first()
+            prompt = session.get(Prompt, prompt_id)
             if not prompt:
                 return {'message': 'Prompt not found'}, 404
             
@@ -233,12 +336,9 @@ class PromptResource(Resource):
                 prompt.user_prompt_template = data['user_prompt_template']
             
             if 'response_schema' in data:
-                response_schema = data['response_schema']
-                if isinstance(response_schema, str):
-                    try:
-                        response_schema = json.loads(response_schema)
-                    except json.JSONDecodeError:
-                        return {'message': 'Invalid JSON in response_schema'}, 400
+                response_schema, error = _parse_response_schema(data['response_schema'])
+                if error:
+                    return {'message': error}, 400
                 prompt.response_schema = response_schema
             
             if 'description' in data:
@@ -269,6 +369,7 @@ class PromptResource(Resource):
             prompt.updated_at = datetime.utcnow()
             
             session.commit()
+            prompt_response_cache.invalidate()
             
             return {
                 'id': prompt.id,
@@ -286,7 +387,7 @@ class PromptResource(Resource):
         """Delete a prompt (or deactivate if it's a default)"""
         session = get_db_session()
         try:
-            prompt = session.query(Prompt).filter(Prompt.id == prompt_id).first()
+            prompt = session.get(Prompt, prompt_id)
             if not prompt:
                 return {'message': 'Prompt not found'}, 404
             
@@ -295,10 +396,12 @@ class PromptResource(Resource):
                 prompt.is_active = False
                 prompt.updated_at = datetime.utcnow()
                 session.commit()
+                prompt_response_cache.invalidate()
                 return {'message': 'Default prompt deactivated successfully'}
             else:
                 session.delete(prompt)
                 session.commit()
+                prompt_response_cache.invalidate()
                 return {'message': 'Prompt deleted successfully'}
             
         except Exception as e:
@@ -307,32 +410,35 @@ class PromptResource(Resource):
         finally:
             session.close()
 
-class PromptByNameResource(Resource):
+class PromptByNameResource(MethodView):
+    decorators = [json_view]
+
     def get(self, template_name):
         """Get the active version of a prompt template by name (used by LLM extractor)"""
-        session = get_db_session()
-        try:
-            prompt = session.query(Prompt).filter(
-                Prompt.template_name == template_name,
-                Prompt.is_active_version == True
-            ).first()
-            
-            if not prompt:
-                return {'message': 'Active prompt template not found'}, 404
-            
-            # Return in the same format as the JSON templates
-            return {
-                'system_prompt': prompt.system_prompt,
-                'user_prompt_template': prompt.user_prompt_template,
-                'response_schema': prompt.response_schema,
-                'metadata': {
-                    'name': prompt.template_name,
-                    'description': prompt.description,
-                    'version': str(prompt.version_number),
-                    'model': prompt.model,
-                    'temperature': prompt.temperature,
-                    'enable_attribute_search': prompt.enable_attribute_search
-                }
+        # Hit on every extraction for a rarely-changing row: serve it from the cache
+        cache_key = ('by_name', template_name)
+        cached = prompt_response_cache.get(cache_key)
+        if cached is not None:
+            return cached.to_response(TEMPLATE_CACHE_CONTROL)
+        cache_version = prompt_response_cache.version
+        
+        with get_readonly_connection() as connection:
+            prompt = connection.execute(ACTIVE_PROMPT_QUERY, {'template_name': template_name}).first()
+        
+        if not prompt:
+            return {'message': 'Active prompt template not found'}, 404
+        
+        # Return in the same format as the JSON templates
+        return prompt_response_cache.set(cache_key, {
+            'system_prompt': prompt.system_prompt,
+            'user_prompt_template': prompt.user_prompt_template,
+            'response_schema': prompt.response_schema,
+            'metadata': {
+                'name': prompt.template_name,
+                'description': prompt.description,
+                'version': str(prompt.version_number),
+                'model': prompt.model,
+                'temperature': prompt.temperature,
+                'enable_attribute_search': prompt.enable_attribute_search
             }
-        finally:
-            session.close()
\ No newline at end of file
+        }, cache_version).to_response(TEMPLATE_CACHE_CONTROL)
@@ -1,15 +1,444 @@
+import logging
 from flask import request
 from flask_restful import Resource
-from models import Expert, Experience, Attribute, experience_attribute_association
-from lib.llm_extractor import LLMExtractor
+from models import Expert
+from lib.llm_extractor import llm_extractor
 from database import get_db_session
-from config import SEARCHABLE_ATTRIBUTE_TYPES, SEARCH_CONFIG, ATTRIBUTE_WEIGHTS
+from lib.serialization import dumps
+from lib.response_cache import MISSING, TTLCache, expert_response_cache, prompt_response_cache
+from config import (SEARCHABLE_ATTRIBUTE_TYPES, SEARCH_CONFIG, ATTRIBUTE_WEIGHTS, SEARCH_EXTRACTION_CACHE_TIMEOUT,
+                    SEARCH_MATCH_CACHE_TIMEOUT, MAX_MATCHING_EXPERIENCES_PER_EXPERT)
 from datetime import datetime, date
-from sqlalchemy import func, and_, text
-from sqlalchemy.orm import joinedload
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import select, text
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+import heapq
+from operator import itemgetter
+import base64
+import json
 import time
 from typing import Dict, List, Any
 
+logger = logging.getLogger(__name__)
+
+# Nearest attribute of the given type for each {"type", "embedding"} term; qi is
+# the term's 1-based position in the input array
+NEAREST_ATTRIBUTE_QUERY = text("""
+    SELECT q.qi, s.id, s.name, 1 - s.distance AS similarity
+    FROM (
+        SELECT CAST(e.v->>'embedding' AS vector) AS qv, e.v->>'type' AS attr_type, e.qi
+        FROM json_array_elements(CAST(:terms AS json)) WITH ORDINALITY AS e(v, qi)
+    ) q
+    CROSS JOIN LATERAL (
+        SELECT id, name, embedding <=> q.qv AS distance
+        FROM attribute
+        WHERE type = q.attr_type
+            AND embedding IS NOT NULL
+        -- Exact order on purpose: an HNSW scan would apply the type filter after
+        -- ef_search candidates from every type, missing sparse types like roles
+        ORDER BY distance
+        LIMIT 1
+    ) s
+""")
+
+# Attributes whose lowercased name and type equal a (name, type) pair from the
+# parallel array parameters; served by ix_attribute_name_lower_type
+EXACT_ATTRIBUTE_QUERY = text("""
+    SELECT a.id, a.name, a.type, a.name_lower
+    FROM unnest(CAST(:names AS text[]), CAST(:types AS text[])) AS t(name_lower, type)
+    JOIN attribute a ON a.name_lower = t.name_lower AND a.type = t.type
+    ORDER BY a.id
+""")
+
+# Matched attribute ids with their similarity and type weight, as parallel array parameters
+_MATCHED_ATTRIBUTES_CTE = """
+    matched AS (
+        SELECT * FROM unnest(
+            CAST(:attribute_ids AS int[]),
+            CAST(:similarities AS float8[]),
+            CAST(:weights AS float8[])
+        ) AS t(attribute_id, similarity, weight)
+    )
+"""
+
+# One experience's contribution for one matched attribute:
+# (years * recency * similarity) ** (weight / 2); a weight of 0 contributes nothing.
+# Computed in float8 so the driver returns floats rather than Decimals
+_CONTRIBUTION_SQL = """
+    CASE WHEN m.weight = 0 THEN 0.0 ELSE POWER(
+        CAST(e.end_date - e.start_date AS float8) / 365 *
+        GREATEST(0.1, 1 - :recency_factor * (CURRENT_DATE - e.end_date) / 365.0) *
+        m.similarity,
+        m.weight / 2.0
+    ) END
+"""
+
+# One page of experts by summed contribution, with the total number of scored experts.
+# The page starts after the (after_score, after_id) keyset position when given,
+# otherwise at :offset. Ranking and the keyset use rank_score, the sum rounded to a
+# fixed-precision numeric: float8 sums can differ in the last bits between runs,
+# and an exact comparison against a float cursor would skip or repeat experts
+RANK_EXPERTS_QUERY = text("""
+    WITH """ + _MATCHED_ATTRIBUTES_CTE + """,
+    contributions AS (
+        SELECT e.expert_id, """ + _CONTRIBUTION_SQL + """ AS score
+        FROM experience e
+        JOIN experience_attribute ea ON e.id = ea.experience_id
+        JOIN matched m ON m.attribute_id = ea.attribute_id
+    ),
+    ranked AS (
+        SELECT expert_id, SUM(score) AS total_score,
+            ROUND(CAST(SUM(score) AS numeric), 9) AS rank_score,
+            COUNT(*) OVER () AS total_experts
+        FROM contributions
+        GROUP BY expert_id
+    )
+    SELECT expert_id, total_score, rank_score, total_experts
+    FROM ranked
+    WHERE CAST(:after_score AS numeric) IS NULL
+        OR rank_score < CAST(:after_score AS numeric)
+        OR (rank_score = CAST(:after_score AS numeric) AND expert_id > :after_id)
+    ORDER BY rank_score DESC, expert_id
+    LIMIT :limit OFFSET :offset
+""")
+
+# The scored experience x attribute rows behind RANK_EXPERTS_QUERY, for the given experts
+EXPERIENCE_CONTRIBUTIONS_QUERY = text("""
+    WITH """ + _MATCHED_ATTRIBUTES_CTE + """
+    SELECT
+        e.expert_id,
+        e.id AS experience_id,
+        e.start_date,
+        e.end_date,
+        e.summary,
+        e.position,
+        e.employer,
+        CAST(e.end_date - e.start_date AS float8) / 365 AS duration_years,
+        ea.attribute_id,
+        a.name AS attribute_name,
+        a.type AS attribute_type,
+        a.summary AS attribute_summary,
+        """ + _CONTRIBUTION_SQL + """ AS score
+    FROM experience e
+    JOIN experience_attribute ea ON e.id = ea.experience_id
+    JOIN matched m ON m.attribute_id = ea.attribute_id
+    JOIN attribute a ON a.id = ea.attribute_id
+    WHERE e.expert_id = ANY(:expert_ids)
+    ORDER BY e.expert_id, e.id
+""")
+
+# Human-readable form of _CONTRIBUTION_SQL, returned in the search metadata
+SCORING_FORMULA = 'Score = (Duration(years) × Recency × Similarity) ^ (TypeWeight/2), 0 weight = 0 contribution'
+
+# Matched attribute columns carried on the scoring rows
+MatchedAttribute = namedtuple('MatchedAttribute', ['id', 'name', 'type', 'summary'])
+
+# Nearest attribute for one extracted term
+NearestAttribute = namedtuple('NearestAttribute', ['id', 'name', 'similarity'])
+
+# LLM term extractions keyed by normalized search text
+_extraction_cache = TTLCache(SEARCH_EXTRACTION_CACHE_TIMEOUT)
+
+# Nearest attribute (or None) keyed by attribute type and normalized term
+_match_cache = TTLCache(SEARCH_MATCH_CACHE_TIMEOUT, max_entries=4096)
+
+def extract_search_terms(search_text):
+    """
+    Run the expert_search_fast template on a search text, reusing the result for repeated texts
+
+    Keys include the prompt cache version, so a prompt edit made through this
+    process takes effect immediately; edits made by other processes take
+    effect once entries expire. Returned dicts are shared and must not be modified.
+    """
+    key = (' '.join(search_text.lower().split()), prompt_response_cache.version)
+    extracted = _extraction_cache.get(key)
+    if extracted is not MISSING:
+        return extracted
+    
+    # Failures propagate and are not cached
+    extracted = llm_extractor.extract_from_template("expert_search_fast", {
+        "text": search_text,
+        "attribute_types": ', '.join(SEARCHABLE_ATTRIBUTE_TYPES)
+    })
+    _extraction_cache.set(key, extracted)
+    return extracted
+
+def match_search_terms(session, term_pairs):
+    """
+    Find the nearest attribute of the given type for each (term, attribute type) pair
+
+    Matches are reused for repeated terms. Keys include the expert cache
+    version, which attribute writes made through this process bump; the
+    timeout bounds staleness for writes made by other processes. Terms equal
+    to an attribute name of their type (ignoring case) match it with
+    similarity 1.0; only the remaining terms are embedded and searched.
+
+    Returns:
+        Dict mapping each pair to a NearestAttribute, or None when no attribute of that type has an embedding
+    """
+    version = expert_response_cache.version
+    keys = {pair: (pair[1], ' '.join(pair[0].lower().split()), version) for pair in term_pairs}
+    matches = {}
+    pending = []
+    for pair in term_pairs:
+        match = _match_cache.get(keys[pair])
+        if match is MISSING:
+            pending.append(pair)
+        else:
+            matches[pair] = match
+    if not pending:
+        return matches
+    
+    # Exact name matches skip the embedding call and the vector search
+    exact = {}
+    for row in session.execute(EXACT_ATTRIBUTE_QUERY, {
+        'names': [term.lower() for term, _ in pending],
+        'types': [attr_type for _, attr_type in pending]
+    }):
+        exact.setdefault((row.name_lower, row.type), NearestAttribute(row.id, row.name, 1.0))
+    remaining = []
+    for pair in pending:
+        match = exact.get((pair[0].lower(), pair[1]))
+        if match is None:
+            remaining.append(pair)
+        else:
+            matches[pair] = match
+            _match_cache.set(keys[pair], match)
+    pending = remaining
+    if not pending:
+        return matches
+    
+    from lib.embedding_service import embedding_service
+    
+    # Reuse cached term embeddings; the misses are embedded in a single API call
+    unique_terms = list(dict.fromkeys(term for term, _ in pending))
+    embedding_by_term = dict(zip(unique_terms, embedding_service.generate_query_embeddings(unique_terms)))
+    
+    # Nearest attribute of the matching type for every pending pair, in one round trip
+    terms_json = dumps([
+        {'type': attr_type, 'embedding': embedding_by_term[term]}
+        for term, attr_type in pending
+    ]).decode('utf-8')
+    nearest = {
+        row.qi: NearestAttribute(row.id, row.name, row.similarity)
+        for row in session.execute(NEAREST_ATTRIBUTE_QUERY, {'terms': terms_json})
+    }
+    for term_index, pair in enumerate(pending, start=1):
+        matches[pair] = nearest.get(term_index)
+        _match_cache.set(keys[pair], matches[pair])
+    return matches
+
+# Search settings a request may override, with their types and allowed ranges
+VALID_SETTINGS = {
+    'similarity_threshold': {'type': float, 'min': 0.0, 'max': 1.0},
+    'max_similar_attributes': {'type': int, 'min': 1, 'max': 100},
+    'max_attributes_per_type': {'type': int, 'min': 1, 'max': 10},
+    'scoring_base': {'type': float, 'min': 1.0, 'max': 2.0},
+    'recency_decay_factor': {'type': float, 'min': 0.0, 'max': 1.0},
+    'similarity_weight': {'type': float, 'min': 0.0, 'max': 2.0}
+}
+
+def merge_config(default_config, overrides):
+    """Merge default configuration with user overrides, validating types and ranges"""
+    merged = default_config.copy()
+    
+    for key, value in overrides.items():
+        if key == 'attribute_weights':
+            # Special handling for attribute weights
+            merged[key] = validate_attribute_weights(value, default_config.get('attribute_weights', ATTRIBUTE_WEIGHTS))
+            logger.debug("Override attribute_weights: %s", merged[key])
+        elif key in VALID_SETTINGS:
+            spec = VALID_SETTINGS[key]
+            # Type validation
+            if not isinstance(value, spec['type']):
+                try:
+                    value = spec['type'](value)
+                except (ValueError, TypeError):
+                    continue  # Skip invalid values
+            
+            # Range validation
+            if 'min' in spec and value < spec['min']:
+                value = spec['min']
+            if 'max' in spec and value > spec['max']:
+                value = spec['max']
+            
+            merged[key] = value
+            logger.debug("Override setting: %s = %s", key, value)
+    
+    return merged
+
+# The merged search settings a request uses; weight_by_type maps attribute
+# type -> weight, and types without an entry weigh 1.0
+SearchSettings = namedtuple('SearchSettings', [
+    'similarity_threshold', 'recency_decay_factor', 'attribute_weights', 'weight_by_type'
+])
+
+@lru_cache(maxsize=256)
+def _merge_settings_json(settings_json):
+    config = merge_config(SEARCH_CONFIG, json.loads(settings_json))
+    attribute_weights = config.get('attribute_weights', ATTRIBUTE_WEIGHTS)
+    return SearchSettings(
+        similarity_threshold=config.get('similarity_threshold', 0.4),
+        recency_decay_factor=config['recency_decay_factor'],
+        attribute_weights=attribute_weights,
+        weight_by_type={weight_item['name']: weight_item['weight'] for weight_item in attribute_weights}
+    )
+
+def effective_search_config(overrides):
+    """
+    merge_config(SEARCH_CONFIG, overrides) resolved into SearchSettings,
+    memoized per distinct overrides
+
+    Most requests send the UI's default settings, so validation runs once per
+    distinct payload. The returned settings are shared and must not be modified.
+    """
+    return _merge_settings_json(json.dumps(overrides or {}, sort_keys=True))
+
+def validate_attribute_weights(user_weights, default_weights):
+    """Validate and merge user-provided attribute weights with defaults"""
+    if not isinstance(user_weights, list):
+        return default_weights
+    
+    # Create a weight lookup from defaults
+    weight_dict = {item['name']: item['weight'] for item in default_weights}
+    
+    # Process user overrides
+    for weight_item in user_weights:
+        if isinstance(weight_item, dict) and 'name' in weight_item and 'weight' in weight_item:
+            attr_name = weight_item['name']
+            if attr_name in SEARCHABLE_ATTRIBUTE_TYPES:
+                try:
+                    weight_value = float(weight_item['weight'])
+                    # Clamp weight to reasonable range (now allowing 0 for geometric weights)
+                    weight_value = max(0.0, min(10.0, weight_value))
+                    weight_dict[attr_name] = weight_value
+                except (ValueError, TypeError):
+                    continue  # Skip invalid weights
+    
+    # Convert back to list format
+    return [{'name': name, 'weight': weight} for name, weight in weight_dict.items()]
+
+def build_expert_matches(details, attribute_by_key, attr_similarity, extracted_term_by_id):
+    """
+    Group one expert's contribution rows into matching experiences and a per-type score breakdown
+
+    Args:
+        details: The expert's experience x attribute contribution dicts
+        attribute_by_key: MatchedAttribute per (experience_id, attribute_id)
+        attr_similarity: Similarity and type weight per matched attribute id
+        extracted_term_by_id: Extracted term per matched attribute id
+
+    Returns:
+        (top matching experiences by score, score breakdown keyed by attribute type)
+    """
+    # Matching experiences and the score breakdown by attribute type, in one pass
+    exp_groups = {}  # Group by experience_id
+    score_by_type = {}
+    
+    for exp_detail in details:
+        exp_id = exp_detail['experience_id']
+        attr_id = exp_detail['attribute_id']
+        attribute = attribute_by_key[(exp_id, attr_id)]
+        # Get weight and similarity info for this attribute
+        attr_info = attr_similarity.get(attr_id, {'similarity': 1.0, 'weight': 1.0})
+        
+        exp_group = exp_groups.get(exp_id)
+        if exp_group is None:
+            exp_group = exp_groups[exp_id] = {
+                'id': exp_id,
+                'summary': exp_detail['summary'],
+                'position': exp_detail['position'],
+                'employer': exp_detail['employer'],
+                'start_date': exp_detail['start_date'].isoformat(),
+                'end_date': exp_detail['end_date'].isoformat(),
+                'matching_attributes': [],
+                'score': 0.0
+            }
+        
+        exp_group['score'] += exp_detail['score']
+        exp_group['matching_attributes'].append({
+            'id': attribute.id,
+            'name': attribute.name,
+            'type': attribute.type,
+            'summary': attribute.summary,
+            'similarity_score': round(attr_info['similarity'], 3),
+            'type_weight': attr_info['weight'],
+            'contribution_score': round(exp_detail['score'], 3)
+        })
+        
+        type_breakdown = score_by_type.get(attribute.type)
+        if type_breakdown is None:
+            type_breakdown = score_by_type[attribute.type] = {
+                'type_weight': attr_info['weight'],
+                'total_contribution': 0.0,
+                'match_count': 0,
+                'total_years': 0.0,
+                'matched_terms': [],
+                'matched_names': set()
+            }
+        
+        exp_years = round(exp_detail['duration_years'], 1)
+        type_breakdown['total_contribution'] += exp_detail['score']
+        type_breakdown['match_count'] += 1
+        type_breakdown['total_years'] += exp_years
+        
+        # Add matched term once per attribute name
+        if attribute.name not in type_breakdown['matched_names']:
+            type_breakdown['matched_names'].add(attribute.name)
+            type_breakdown['matched_terms'].append({
+                'name': attribute.name,
+                'similarity_score': round(float(attr_info.get('similarity', 0.0)), 3),
+                'extracted_term': extracted_term_by_id.get(attr_id, 'N/A'),
+                'years': exp_years
+            })
+    
+    # Top experiences by running score, rounding it only for output; the
+    # breakdown above still covers every matching experience
+    matching_experiences = heapq.nlargest(
+        MAX_MATCHING_EXPERIENCES_PER_EXPERT, exp_groups.values(), key=itemgetter('score')
+    )
+    for exp in matching_experiences:
+        exp['score'] = round(exp['score'], 2)
+    
+    final_score_breakdown = {
+        attr_type: {
+            'type_weight': data['type_weight'],
+            'total_contribution': round(data['total_contribution'], 2),
+            'match_count': data['match_count'],
+            'total_years': round(data['total_years'], 1),
+            'matched_terms': data['matched_terms']
+        }
+        for attr_type, data in score_by_type.items()
+    }
+    return matching_experiences, final_score_breakdown
+
+def _encode_cursor(rank_score, expert_id):
+    """Opaque keyset cursor for the ranking position just after this expert"""
+    # The numeric rank score travels as a string so it round-trips exactly
+    return base64.urlsafe_b64encode(json.dumps([str(rank_score), expert_id]).encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor):
+    """Inverse of _encode_cursor; raises ValueError/TypeError/AttributeError on malformed input"""
+    rank_score, expert_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    try:
+        rank_score = Decimal(rank_score)
+    except InvalidOperation:
+        raise ValueError(f"Invalid cursor score: {rank_score!r}")
+    if not rank_score.is_finite():
+        raise ValueError(f"Invalid cursor score: {rank_score!r}")
+    return rank_score, int(expert_id)
+
+def _page_params(data):
+    """
+    page and page_size from a JSON search body, clamped like limit in routes/attributes.py
+    so a bad page can't make a negative OFFSET; raises TypeError/ValueError on non-integers
+    """
+    page_size = max(1, min(int(data.get('page_size', SEARCH_CONFIG['default_page_size'])),
+                           SEARCH_CONFIG['max_page_size']))
+    page = max(1, int(data.get('page', 1)))
+    return page, page_size
+
 class ExpertSearchResource(Resource):
     def post(self):
         """
@@ -26,9 +455,12 @@ class ExpertSearchResource(Resource):
             if 'application/json' in content_type:
                 data = request.get_json()
                 search_text = data.get('text', '')
-                page_size = min(data.get('page_size', SEARCH_CONFIG['default_page_size']), 
-                              SEARCH_CONFIG['max_page_size'])
-                page = data.get('page', 1)
+                try:
+                    page, page_size = _page_params(data)
+                except (TypeError, ValueError):
+                    return {'message': 'page and page_size must be integers'}, 400
+                # Keyset cursor from a previous page's next_cursor; takes precedence over page
+                cursor = data.get('cursor')
                 
                 # Parse search configuration overrides
                 search_settings = data.get('settings', {})
@@ -37,6 +469,7 @@ class ExpertSearchResource(Resource):
                 search_text = request.get_data(as_text=True)
                 page_size = SEARCH_CONFIG['default_page_size']
                 page = 1
+                cursor = None
                 search_settings = {}  # No settings override for plain text
                 
             else:
@@ -45,108 +478,48 @@ class ExpertSearchResource(Resource):
             if not search_text.strip():
                 return {'message': 'Search text cannot be empty'}, 400
             
-            # Merge default config with user-provided settings
-            def merge_config(default_config, overrides):
-                """Merge default configuration with user overrides, validating types and ranges"""
-                merged = default_config.copy()
-                
-                # Define valid overridable settings with validation
-                valid_settings = {
-                    'similarity_threshold': {'type': float, 'min': 0.0, 'max': 1.0},
-                    'max_similar_attributes': {'type': int, 'min': 1, 'max': 100},
-                    'max_attributes_per_type': {'type': int, 'min': 1, 'max': 10},
-                    'scoring_base': {'type': float, 'min': 1.0, 'max': 2.0},
-                    'recency_decay_factor': {'type': float, 'min': 0.0, 'max': 1.0},
-                    'similarity_weight': {'type': float, 'min': 0.0, 'max': 2.0}
-                }
-                
-                for key, value in overrides.items():
-                    if key == 'attribute_weights':
-                        # Special handling for attribute weights
-                        merged[key] = validate_attribute_weights(value, default_config.get('attribute_weights', ATTRIBUTE_WEIGHTS))
-                        print(f"DEBUG - Override attribute_weights: {merged[key]}")
-                    elif key in valid_settings:
-                        spec = valid_settings[key]
-                        # Type validation
-                        if not isinstance(value, spec['type']):
-                            try:
-                                value = spec['type'](value)
-                            except (ValueError, TypeError):
-                                continue  # Skip invalid values
-                        
-                        # Range validation
-                        if 'min' in spec and value < spec['min']:
-                            value = spec['min']
-                        if 'max' in spec and value > spec['max']:
-                            value = spec['max']
-                        
-                        merged[key] = value
-                        print(f"DEBUG - Override setting: {key} = {value}")
-                
-                return merged
+            after_score = after_id = None
+            if cursor:
+                try:
+                    after_score, after_id = _decode_cursor(cursor)
+                except (ValueError, TypeError, AttributeError):
+                    return {'message': 'Invalid cursor'}, 400
             
-            def validate_attribute_weights(user_weights, default_weights):
-                """Validate and merge user-provided attribute weights with defaults"""
-                if not isinstance(user_weights, list):
-                    return default_weights
-                
-                # Create a weight lookup from defaults
-                weight_dict = {item['name']: item['weight'] for item in default_weights}
-                
-                # Process user overrides
-                for weight_item in user_weights:
-                    if isinstance(weight_item, dict) and 'name' in weight_item and 'weight' in weight_item:
-                        attr_name = weight_item['name']
-                        if attr_name in SEARCHABLE_ATTRIBUTE_TYPES:
-                            try:
-                                weight_value = float(weight_item['weight'])
-                                # Clamp weight to reasonable range (now allowing 0 for geometric weights)
-                                weight_value = max(0.0, min(10.0, weight_value))
-                                weight_dict[attr_name] = weight_value
-                            except (ValueError, TypeError):
-                                continue  # Skip invalid weights
-                
-                # Convert back to list format
-                return [{'name': name, 'weight': weight} for name, weight in weight_dict.items()]
+            # Whole responses are reused until an expert, experience or attribute write
+            # (or the cache timeout); the prompt version covers extraction prompt edits
+            cache_key = (
+                'search', ' '.join(search_text.lower().split()), json.dumps(search_settings or {}, sort_keys=True),
+                page, page_size, after_score, after_id, prompt_response_cache.version
+            )
+            cached = expert_response_cache.get(cache_key)
+            if cached is not None:
+                return cached.to_response()
+            cache_version = expert_response_cache.version
             
             # Apply setting overrides
-            effective_config = merge_config(SEARCH_CONFIG, search_settings)
-            print(f"DEBUG - Effective weights being used: {effective_config.get('attribute_weights', ATTRIBUTE_WEIGHTS)}")
-            
-            # Create a helper function to get attribute weights
-            def get_attribute_weight(attr_type):
-                """Get the weight for a given attribute type"""
-                weights = effective_config.get('attribute_weights', ATTRIBUTE_WEIGHTS)
-                for weight_item in weights:
-                    if weight_item['name'] == attr_type:
-                        return weight_item['weight']
-                return 1.0  # Default weight if not found
+            settings = effective_search_config(search_settings)
+            weight_by_type = settings.weight_by_type
+            logger.debug("Effective weights being used: %s", settings.attribute_weights)
             
             # STEP 1: Extract 1-2 attributes from each type using LLM
             try:
                 llm_start = time.time()
-                print(f"DEBUG - Extracting attributes from search query: '{search_text[:100]}...'")
+                logger.debug("Extracting attributes from search query: '%.100s...'", search_text)
                 
-                extractor = LLMExtractor()
-                llm_extracted = extractor.extract_from_template("expert_search_fast", {
-                    "text": search_text,
-                    "attribute_types": ', '.join(SEARCHABLE_ATTRIBUTE_TYPES)
-                })
+                llm_extracted = extract_search_terms(search_text)
                 
                 llm_time = time.time() - llm_start
-                print(f"DEBUG - LLM attribute extraction completed in {llm_time:.2f}s")
-                print(f"DEBUG - Raw LLM output: {llm_extracted}")
+                logger.debug("LLM attribute extraction completed in %.2fs", llm_time)
+                logger.debug("Raw LLM output: %s", llm_extracted)
                 
                 # STEP 2: Batch generate embeddings and find similar DB attributes
-                from lib.embedding_service import embedding_service
-                
                 search_attributes = {}  # Final attributes to search for, with similarity scores
+                extracted_term_by_id = {}  # Matched attribute id -> the extracted term that matched it first
                 extracted_attributes = {}  # For UI display
-                similarity_threshold = effective_config.get('similarity_threshold', 0.4)
+                similarity_threshold = settings.similarity_threshold
                 
-                # Collect all terms for batch embedding generation
-                all_terms = []
-                term_to_type = {}
+                # (term, attribute type) pairs; a term extracted for several types is embedded once
+                term_pairs = []
                 
                 for attr_type in SEARCHABLE_ATTRIBUTE_TYPES:
                     attr_key = f"{attr_type}_terms"
@@ -157,15 +530,14 @@ class ExpertSearchResource(Resource):
                         terms = llm_extracted[attr_key][:1] if llm_extracted[attr_key] else []
                         for term in terms:
                             if term.strip():
-                                all_terms.append(term.strip())
-                                term_to_type[term.strip()] = attr_type
+                                term_pairs.append((term.strip(), attr_type))
                     
                     # Always ensure extracted_attributes has an entry for each type that was extracted
                     if attr_key in llm_extracted and llm_extracted[attr_key] and attr_type not in extracted_attributes:
                         extracted_attributes[attr_type] = []
                 
                 # Even if no terms are extracted, show what the LLM extracted
-                if not all_terms:
+                if not term_pairs:
                     # Add all extracted terms as no_match entries
                     for attr_type in SEARCHABLE_ATTRIBUTE_TYPES:
                         attr_key = f"{attr_type}_terms"
@@ -183,32 +555,12 @@ class ExpertSearchResource(Resource):
                                     })
                 
                 # Batch generate embeddings for all terms at once
-                if all_terms:
+                if term_pairs:
                     try:
-                        # Generate all embeddings in a single API call
-                        embeddings = embedding_service.generate_batch_embeddings(all_terms)
+                        matches = match_search_terms(session, term_pairs)
                         
-                        # Process each term with its embedding
-                        for term, term_embedding in zip(all_terms, embeddings):
-                            attr_type = term_to_type[term]
-                            
-                            # Convert embedding to pgvector format
-                            embedding_str = '[' + ','.join(map(str, term_embedding)) + ']'
-                            
-                            # Single optimized query that returns all needed data (no similarity threshold)
-                            similarity_query = text(f"""
-                                SELECT id, name, type, summary, 
-                                       (1 - (embedding <=> '{embedding_str}'::vector)) AS similarity
-                                FROM attribute 
-                                WHERE type = :attr_type 
-                                  AND embedding IS NOT NULL
-                                ORDER BY embedding <=> '{embedding_str}'::vector
-                                LIMIT 1
-                            """)
-                            
-                            result = session.execute(similarity_query, {
-                                'attr_type': attr_type
-                            }).fetchone()
+                        for term, attr_type in term_pairs:
+                            result = matches[(term, attr_type)]
                             
                             if result:
                                 search_attributes[attr_type].append({
@@ -217,6 +569,7 @@ class ExpertSearchResource(Resource):
                                     'similarity': result.similarity,
                                     'extracted_term': term
                                 })
+                                extracted_term_by_id.setdefault(result.id, term)
                                 extracted_attributes[attr_type].append({
                                     'id': result.id,
                                     'name': f"{term} → {result.name}",
@@ -233,7 +586,7 @@ class ExpertSearchResource(Resource):
                                     'source': 'no_match'
                                 })
                     except Exception as embedding_error:
-                        print(f"ERROR - Batch embedding generation failed: {str(embedding_error)}")
+                        logger.exception("Batch embedding generation failed")
                         return {'message': f'Failed to generate embeddings: {str(embedding_error)}'}, 500
                 
                 # Get all attribute IDs for scoring
@@ -249,15 +602,13 @@ class ExpertSearchResource(Resource):
                 }
                 
             except Exception as llm_error:
-                print(f"ERROR - LLM extraction failed: {str(llm_error)}")
-                import traceback
-                traceback.print_exc()
+                logger.exception("LLM extraction failed")
                 return {'message': f'Failed to extract attributes: {str(llm_error)}'}, 500
             
             # STEP 3: Score each experience that has matching attributes
             if not all_attribute_ids:
                 # No matching attributes found, but still return extracted data
-                return {
+                return expert_response_cache.set(cache_key, {
                     'experts': [],
                     'search_metadata': {
                         'extracted_attributes': extracted_attributes,
@@ -266,113 +617,82 @@ class ExpertSearchResource(Resource):
                         'search_time_ms': round((time.time() - start_time) * 1000, 2),
                         'message': 'No matching attributes found in database'
                     }
-                }, 200
+                }, cache_version).to_response()
             
-            print(f"DEBUG - Found {len(all_attribute_ids)} matching attribute IDs: {all_attribute_ids}")
+            logger.debug("Found %d matching attribute IDs: %s", len(all_attribute_ids), all_attribute_ids)
             
             query_start = time.time()
-            recency_factor = effective_config['recency_decay_factor']
+            recency_factor = settings.recency_decay_factor
             
             # Build attribute similarity lookup
             attr_similarity = {}
             for attr_type, attrs in search_attributes.items():
                 for attr in attrs:
-                    weight = get_attribute_weight(attr_type)
-                    print(f"DEBUG - Attribute {attr['id']} ({attr_type}): weight={weight}, similarity={attr['similarity']}")
+                    weight = weight_by_type.get(attr_type, 1.0)
+                    logger.debug("Attribute %s (%s): weight=%s, similarity=%s", attr['id'], attr_type, weight, attr['similarity'])
                     attr_similarity[attr['id']] = {
                         'similarity': attr['similarity'],
                         'weight': weight
                     }
             
-            # Simple scoring query: years * recency * similarity * weight for each experience
-            scoring_query = text("""
-                SELECT 
-                    e.expert_id,
-                    e.id as experience_id,
-                    e.start_date,
-                    e.end_date,
-                    e.summary,
-                    e.position,
-                    e.employer,
-                    (e.end_date - e.start_date) / 365.0 as duration_years,
-                    GREATEST(0.1, 1 - :recency_factor * (CURRENT_DATE - e.end_date) / 365.0) as recency_multiplier,
-                    ea.attribute_id
-                FROM experience e
-                JOIN experience_attribute ea ON e.id = ea.experience_id  
-                WHERE ea.attribute_id = ANY(:attribute_ids)
-                ORDER BY e.expert_id, e.id
-            """)
-            
-            results = session.execute(scoring_query, {
-                'attribute_ids': all_attribute_ids,
+            # Rank experts in Postgres and fetch the contributing rows for the page only
+            attribute_ids = list(attr_similarity)
+            params = {
+                'attribute_ids': attribute_ids,
+                'similarities': [float(attr_similarity[attr_id]['similarity']) for attr_id in attribute_ids],
+                'weights': [float(attr_similarity[attr_id]['weight']) for attr_id in attribute_ids],
                 'recency_factor': recency_factor
+            }
+            # Fetch one extra row to learn whether there is a next page
+            ranked = session.execute(RANK_EXPERTS_QUERY, {
+                **params,
+                'after_score': None if after_score is None else str(after_score),
+                'after_id': after_id,
+                'limit': page_size + 1,
+                'offset': 0 if cursor else (page - 1) * page_size
             }).fetchall()
             
-            # Calculate scores in Python for clarity
-            expert_scores = {}
-            experience_details = {}
+            paginated_experts = [(row.expert_id, row.total_score) for row in ranked[:page_size]]
+            total_count = ranked[0].total_experts if ranked else 0
+            next_cursor = None
+            if len(ranked) > page_size:
+                last = ranked[page_size - 1]
+                next_cursor = _encode_cursor(last.rank_score, last.expert_id)
+            
+            results = session.execute(EXPERIENCE_CONTRIBUTIONS_QUERY, {
+                **params,
+                'expert_ids': [expert_id for expert_id, score in paginated_experts]
+            }).fetchall() if paginated_experts else []
+            
+            # Per-experience contributions for the score breakdowns
+            experience_details = defaultdict(list)
+            attribute_by_key = {}
             
             for row in results:
-                expert_id = row.expert_id
-                exp_id = row.experience_id
-                attr_id = row.attribute_id
-                
-                # Get similarity and weight for this attribute
-                attr_info = attr_similarity.get(attr_id, {'similarity': 1.0, 'weight': 1.0})
-                
-                # Calculate experience score using geometric weights: (years * recency * similarity) ** weight
-                # This ensures weight=0 makes the contribution neutral (score^0 = 1), effectively eliminating the attribute
-                base_score = (
-                    float(row.duration_years) * 
-                    float(row.recency_multiplier) * 
-                    attr_info['similarity']
-                )
-                
-                weight = attr_info['weight']
-                if weight == 0:
-                    # Weight of 0 means no contribution from this attribute
-                    exp_score = 0.0
-                else:
-                    # Geometric weight application: base_score raised to the power of (weight/2)
-                    # Using weight/2 to prevent extreme values while maintaining zero-effect property
-                    exp_score = base_score ** (weight / 2.0)
-                
-                # Accumulate expert score
-                if expert_id not in expert_scores:
-                    expert_scores[expert_id] = 0.0
-                    experience_details[expert_id] = []
-                
-                expert_scores[expert_id] += exp_score
-                
+                exp_key = (row.experience_id, row.attribute_id)
                 # Store experience details (avoid duplicates)
-                exp_key = f"{exp_id}_{attr_id}"
-                if not any(ed.get('key') == exp_key for ed in experience_details[expert_id]):
-                    experience_details[expert_id].append({
-                        'key': exp_key,
-                        'experience_id': exp_id,
+                if exp_key not in attribute_by_key:
+                    attribute_by_key[exp_key] = MatchedAttribute(
+                        row.attribute_id, row.attribute_name, row.attribute_type, row.attribute_summary
+                    )
+                    experience_details[row.expert_id].append({
+                        'experience_id': row.experience_id,
                         'start_date': row.start_date,
                         'end_date': row.end_date,
                         'summary': row.summary,
                         'position': row.position,
                         'employer': row.employer,
-                        'attribute_id': attr_id,
-                        'score': exp_score,
-                        'duration_years': float(row.duration_years)
+                        'attribute_id': row.attribute_id,
+                        'score': row.score,
+                        'duration_years': row.duration_years
                     })
             
-            # Sort experts by total score
-            sorted_experts = sorted(expert_scores.items(), key=lambda x: x[1], reverse=True)
-            
-            # Apply pagination
-            offset = (page - 1) * page_size
-            paginated_experts = sorted_experts[offset:offset + page_size]
-            
             query_time = time.time() - query_start
-            print(f"DEBUG - Scoring completed in {query_time:.2f}s")
-            print(f"DEBUG - Found {len(expert_scores)} experts with scores")
+            logger.debug("Scoring completed in %.2fs", query_time)
+            logger.debug("Found %d experts with scores", total_count)
             
             if not paginated_experts:
-                return {
+                return expert_response_cache.set(cache_key, {
                     'experts': [],
                     'search_metadata': {
                         'extracted_attributes': extracted_attributes,
@@ -380,181 +700,34 @@ class ExpertSearchResource(Resource):
                         'search_time_ms': round((time.time() - start_time) * 1000, 2),
                         'message': 'No experts found with matching experience'
                     }
-                }, 200
+                }, cache_version).to_response()
             
             # STEP 4: Get detailed expert information
             expert_ids = [expert_id for expert_id, score in paginated_experts]
             
-            # Query experts with their experiences and attributes
-            experts = session.query(Expert).options(
-                joinedload(Expert.experiences).joinedload(Experience.attributes)
-            ).filter(Expert.id.in_(expert_ids)).all()
+            # Only the expert columns the response uses; the matched experiences and
+            # attributes already came with the scoring rows
+            expert_by_id = {
+                expert.id: expert
+                for expert in session.execute(
+                    select(Expert.id, Expert.name, Expert.summary, Expert.status, Expert.meta)
+                    .where(Expert.id.in_(expert_ids))
+                )
+            }
             
             # Build response in score order
             expert_results = []
-            print(f"DEBUG - About to process {len(paginated_experts)} paginated experts")
+            logger.debug("About to process %d paginated experts", len(paginated_experts))
             
             for expert_id, total_score in paginated_experts:
-                print(f"DEBUG - Processing expert {expert_id} with score {total_score}")
-                # Find the expert object
-                expert = next(e for e in experts if e.id == expert_id)
+                logger.debug("Processing expert %s with score %s", expert_id, total_score)
+                expert = expert_by_id[expert_id]
                 
-                # Build matching experiences from our stored details
-                matching_experiences = []
-                exp_groups = {}  # Group by experience_id
-                
-                for exp_detail in experience_details[expert_id]:
-                    exp_id = exp_detail['experience_id']
-                    if exp_id not in exp_groups:
-                        exp_groups[exp_id] = {
-                            'id': exp_id,
-                            'summary': exp_detail['summary'],
-                            'position': exp_detail['position'],
-                            'employer': exp_detail['employer'],
-                            'start_date': exp_detail['start_date'].isoformat(),
-                            'end_date': exp_detail['end_date'].isoformat(),
-                            'total_score': 0.0,
-                            'matching_attributes': []
-                        }
-                    
-                    exp_groups[exp_id]['total_score'] += exp_detail['score']
-                    
-                    # Find the attribute details
-                    attr_id = exp_detail['attribute_id']
-                    for attr in expert.experiences:
-                        if attr.id == exp_id:
-                            for attribute in attr.attributes:
-                                if attribute.id == attr_id:
-                                    # Get weight and similarity info for this attribute
-                                    attr_info = attr_similarity.get(attr_id, {'similarity': 1.0, 'weight': 1.0})
-                                    
-                                    exp_groups[exp_id]['matching_attributes'].append({
-                                        'id': attribute.id,
-                                        'name': attribute.name,
-                                        'type': attribute.type,
-                                        'summary': attribute.summary,
-                                        'similarity_score': round(attr_info['similarity'], 3),
-                                        'type_weight': attr_info['weight'],
-                                        'contribution_score': round(exp_detail['score'], 3)
-                                    })
-                                    break
-                            break
-                
-                # Convert to list and sort by score
-                matching_experiences = list(exp_groups.values())
-                matching_experiences.sort(key=lambda x: x['total_score'], reverse=True)
-                
-                # Round scores
-                for exp in matching_experiences:
-                    exp['score'] = round(exp['total_score'], 2)
-                    del exp['total_score']
-                
-                # Calculate score breakdown by attribute type with detailed matching information
-                score_by_type = {}
-                print(f"DEBUG - Starting SIMPLIFIED enhanced score breakdown for expert {expert_id}")
-                try:
-                    # First pass: collect basic data
-                    for exp_detail in experience_details[expert_id]:
-                        attr_id = exp_detail['attribute_id']
-                        attr_info = attr_similarity.get(attr_id, {'similarity': 1.0, 'weight': 1.0})
-                        exp_years = round(float(exp_detail.get('duration_years', 0)), 1)
-                        
-                        # Find attribute type and name
-                        attr_type = None
-                        attr_name = None
-                        for attr in expert.experiences:
-                            if attr.id == exp_detail['experience_id']:
-                                for attribute in attr.attributes:
-                                    if attribute.id == attr_id:
-                                        attr_type = attribute.type
-                                        attr_name = attribute.name
-                                        break
-                                break
-                        
-                        if attr_type and attr_name:
-                            # Initialize if needed
-                            if attr_type not in score_by_type:
-                                score_by_type[attr_type] = {
-                                    'type_weight': attr_info['weight'],
-                                    'total_contribution': 0.0,
-                                    'match_count': 0,
-                                    'total_years': 0.0,
-                                    'matched_terms': []
-                                }
-                            
-                            # Add to totals
-                            score_by_type[attr_type]['total_contribution'] += exp_detail['score']
-                            score_by_type[attr_type]['match_count'] += 1
-                            score_by_type[attr_type]['total_years'] += exp_years
-                            
-                            # Add matched term (simple version to avoid IndexError)
-                            existing_term = any(t['name'] == attr_name for t in score_by_type[attr_type]['matched_terms'])
-                            if not existing_term:
-                                # Simple extracted term lookup
-                                extracted_term = 'N/A'
-                                if attr_type in search_attributes and search_attributes[attr_type]:
-                                    for attr_data in search_attributes[attr_type]:
-                                        if attr_data.get('id') == attr_id:
-                                            extracted_term = attr_data.get('extracted_term', 'N/A')
-                                            break
-                                
-                                score_by_type[attr_type]['matched_terms'].append({
-                                    'name': attr_name,
-                                    'similarity_score': round(float(attr_info.get('similarity', 0.0)), 3),
-                                    'extracted_term': extracted_term,
-                                    'years': exp_years
-                                })
-                    
-                    print(f"DEBUG - SIMPLIFIED enhanced calculation completed successfully")
-
-                except Exception as e:
-                    print(f"ERROR - Enhanced score breakdown failed: {str(e)}")
-                    print(f"ERROR - Exception type: {type(e).__name__}")
-                    import traceback
-                    traceback.print_exc()
-                    print(f"ERROR - Falling back to basic score breakdown")
-                    # Fall back to basic score breakdown
-                    score_by_type = {}
-                    for exp_detail in experience_details[expert_id]:
-                        attr_id = exp_detail['attribute_id']
-                        attr_info = attr_similarity.get(attr_id, {'similarity': 1.0, 'weight': 1.0})
-                        # Find basic attribute type
-                        attr_type = None
-                        for attr in expert.experiences:
-                            if attr.id == exp_detail['experience_id']:
-                                for attribute in attr.attributes:
-                                    if attribute.id == attr_id:
-                                        attr_type = attribute.type
-                                        break
-                                break
-                        if attr_type:
-                            if attr_type not in score_by_type:
-                                score_by_type[attr_type] = {
-                                    'type_weight': attr_info['weight'],
-                                    'total_contribution': 0.0,
-                                    'match_count': 0
-                                }
-                            score_by_type[attr_type]['total_contribution'] += exp_detail['score']
-                            score_by_type[attr_type]['match_count'] += 1
-
-                # Create final score breakdown with enhanced fields (if available)
-                final_score_breakdown = {}
-                print(f"DEBUG - Pre-final score_by_type: {score_by_type}")
-                for attr_type, data in score_by_type.items():
-                    breakdown_entry = {
-                        'type_weight': data['type_weight'],
-                        'total_contribution': round(data['total_contribution'], 2),
-                        'match_count': data['match_count']
-                    }
-                    # Add enhanced fields if they exist
-                    if 'total_years' in data:
-                        breakdown_entry['total_years'] = round(data['total_years'], 1)
-                    if 'matched_terms' in data:
-                        breakdown_entry['matched_terms'] = data['matched_terms']
-                    
-                    final_score_breakdown[attr_type] = breakdown_entry
+                matching_experiences, final_score_breakdown = build_expert_matches(
+                    experience_details[expert_id], attribute_by_key, attr_similarity, extracted_term_by_id
+                )
                 
-                print(f"DEBUG - Final score breakdown for {expert.name}: {final_score_breakdown}")
+                logger.debug("Final score breakdown for %s: %s", expert.name, final_score_breakdown)
 
                 expert_result = {
                     'id': expert.id,
@@ -567,12 +740,8 @@ class ExpertSearchResource(Resource):
                     'score_breakdown': final_score_breakdown
                 }
                 
-                print(f"DEBUG - Expert result score_breakdown: {final_score_breakdown}")
-                
                 expert_results.append(expert_result)
             
-            # Get total count for pagination
-            total_count = len(expert_scores)
             search_time_ms = round((time.time() - start_time) * 1000, 2)
             
             # Debug: Check final response data
@@ -585,33 +754,29 @@ class ExpertSearchResource(Resource):
                     'page': page,
                     'page_size': page_size,
                     'total_pages': (total_count + page_size - 1) // page_size,
+                    'next_cursor': next_cursor,
                     'search_time_ms': search_time_ms,
                     'settings_used': {
-                        'similarity_threshold': effective_config['similarity_threshold'],
-                        'recency_decay_factor': effective_config['recency_decay_factor'],
-                        'attribute_weights': effective_config.get('attribute_weights', ATTRIBUTE_WEIGHTS)
+                        'similarity_threshold': settings.similarity_threshold,
+                        'recency_decay_factor': settings.recency_decay_factor,
+                        'attribute_weights': settings.attribute_weights
                     },
-                    'scoring_formula': 'Score = (Duration(years) × Recency × Similarity) ^ (TypeWeight/2), 0 weight = 0 contribution',
-                    'attribute_type_weights': {
-                        weight_item['name']: weight_item['weight'] 
-                        for weight_item in effective_config.get('attribute_weights', ATTRIBUTE_WEIGHTS)
-                    }
+                    'scoring_formula': SCORING_FORMULA,
+                    'attribute_type_weights': weight_by_type
                 }
             }
             
             # Debug final response structure
-            if final_response['experts']:
+            if final_response['experts'] and logger.isEnabledFor(logging.DEBUG):
                 first_expert = final_response['experts'][0]
-                print(f"DEBUG - Final response expert score_breakdown keys: {list(first_expert['score_breakdown'].keys())}")
+                logger.debug("Final response expert score_breakdown keys: %s", list(first_expert['score_breakdown']))
                 for attr_type, breakdown in first_expert['score_breakdown'].items():
-                    print(f"DEBUG - Final response {attr_type} breakdown keys: {list(breakdown.keys())}")
+                    logger.debug("Final response %s breakdown keys: %s", attr_type, list(breakdown))
             
-            return final_response, 200
+            return expert_response_cache.set(cache_key, final_response, cache_version).to_response()
             
         except Exception as e:
-            print(f"ERROR - Expert search failed: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Expert search failed")
             return {'message': f'Search failed: {str(e)}'}, 500
             
         finally:
@@ -0,0 +1,34 @@
+import numpy as np
+
+from lib.attribute_index import DEPTH_PENALTY, POPULARITY_WEIGHT, popularity_boost, rerank
+
+
+def test_popularity_boost_is_log_scaled():
+    boosts = popularity_boost(np.array([0, 1, 9], dtype=np.float32))
+    np.testing.assert_allclose(boosts, POPULARITY_WEIGHT * np.log1p([0, 1, 9]), rtol=1e-6)
+    assert boosts[0] == 0
+
+
+def test_rerank_orders_by_adjusted_score():
+    similarities = np.array([0.80, 0.90, 0.85], dtype=np.float32)
+    depths = np.zeros(3, dtype=np.float32)
+    exp_counts = np.zeros(3, dtype=np.float32)
+    order, adjusted = rerank(similarities, depths, exp_counts, limit=3)
+    assert order.tolist() == [1, 2, 0]
+    np.testing.assert_allclose(adjusted, similarities)
+
+
+def test_rerank_applies_depth_penalty_and_popularity_boost():
+    similarities = np.array([0.900, 0.905, 0.895], dtype=np.float32)
+    depths = np.array([0, 2, 0], dtype=np.float32)
+    exp_counts = np.array([0, 0, 20], dtype=np.float32)
+    order, adjusted = rerank(similarities, depths, exp_counts, limit=3)
+    assert order.tolist() == [2, 0, 1]
+    assert adjusted[1] == np.float32(0.905) - np.float32(2 * DEPTH_PENALTY)
+
+
+def test_rerank_keeps_only_limit_candidates():
+    similarities = np.linspace(0, 1, 50, dtype=np.float32)
+    order, adjusted = rerank(similarities, np.zeros(50, dtype=np.float32), np.zeros(50, dtype=np.float32), limit=5)
+    assert order.tolist() == [49, 48, 47, 46, 45]
+    assert len(adjusted) == 50
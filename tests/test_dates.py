@@ -0,0 +1,19 @@
+from datetime import date
+
+import pytest
+
+from lib.dates import parse_date
+
+
+def test_parses_iso_date():
+    assert parse_date('2020-03-01') == date(2020, 3, 1)
+
+
+@pytest.mark.parametrize('value', ['2020-03-01T12:30:00', '2020-03-01 00:00:00', '2020-03-01T12:30:00+02:00'])
+def test_falls_back_to_timestamps(value):
+    assert parse_date(value) == date(2020, 3, 1)
+
+
+def test_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_date('March 2020')
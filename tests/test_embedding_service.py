@@ -0,0 +1,36 @@
+import pytest
+
+from lib.embedding_service import EmbeddingService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = EmbeddingService()
+    service.batches = []
+
+    def generate_batch_embeddings(texts):
+        service.batches.append(list(texts))
+        return [[float(len(text)), float(ord(text[0]))] for text in texts]
+
+    monkeypatch.setattr(service, 'generate_batch_embeddings', generate_batch_embeddings)
+    return service
+
+
+def test_results_follow_input_order_with_one_call_for_misses(service):
+    first = service.generate_query_embeddings(['bb', 'a'])
+    assert service.batches == [['bb', 'a']]
+
+    results = service.generate_query_embeddings(['ccc', 'a', '  BB ', 'ccc'])
+    assert service.batches[1:] == [['ccc']]
+    assert results == [[3.0, 99.0], first[1], first[0], [3.0, 99.0]]
+
+
+def test_fully_cached_queries_make_no_call(service):
+    service.generate_query_embeddings(['x'])
+    assert service.generate_query_embedding('X') == [1.0, 120.0]
+    assert len(service.batches) == 1
+
+
+def test_returned_vectors_are_copies(service):
+    service.generate_query_embedding('x').append(0.0)
+    assert service.generate_query_embedding('x') == [1.0, 120.0]
@@ -0,0 +1,44 @@
+import logging
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+
+from lib.query_counter import install_query_counter
+from lib.serialization import stream_json_list
+
+
+@pytest.fixture
+def client():
+    engine = create_engine('sqlite://')
+    app = Flask(__name__)
+    install_query_counter(app, engine, {}, default_limit=2)
+
+    @app.route('/buffered')
+    def buffered():
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+        return {'ok': True}
+
+    @app.route('/streamed')
+    def streamed():
+        connection = engine.connect()
+        items = (connection.scalar(text('SELECT :i'), {'i': i}) for i in range(5))
+        response = stream_json_list('items', items)
+        response.call_on_close(connection.close)
+        return response
+
+    return app.test_client()
+
+
+def test_buffered_response_reports_count(client):
+    assert client.get('/buffered').headers['X-Query-Count'] == '1'
+
+
+def test_streamed_queries_are_counted_after_the_body(client, caplog):
+    with caplog.at_level(logging.WARNING, logger='lib.query_counter'):
+        response = client.get('/streamed')
+        assert response.get_json() == {'items': [0, 1, 2, 3, 4]}
+        assert 'X-Query-Count' not in response.headers
+        response.close()
+    assert 'GET /streamed ran 5 SQL statements (budget 2)' in caplog.text
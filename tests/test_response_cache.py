@@ -0,0 +1,59 @@
+import pytest
+from flask import Flask
+
+from lib import response_cache
+from lib.response_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_set_then_get_returns_serialized_body():
+    cache = ResponseCache()
+    cache.set('k', {'a': 1}, cache.version)
+    assert cache.get('k').body == b'{"a":1}'
+
+
+def test_entry_built_before_a_write_is_not_stored():
+    cache = ResponseCache()
+    version = cache.version
+    cache.invalidate()
+    entry = cache.set('k', {'a': 1}, version)
+    assert entry.body == b'{"a":1}'
+    assert cache.get('k') is None
+
+
+def test_invalidate_drops_entries_and_bumps_version():
+    cache = ResponseCache()
+    cache.set('k', [], cache.version)
+    version = cache.version
+    cache.invalidate()
+    assert cache.version == version + 1
+    assert cache.get('k') is None
+
+
+def test_entries_expire(clock):
+    cache = ResponseCache(timeout=60)
+    cache.set('k', [], cache.version)
+    clock[0] += 59
+    assert cache.get('k') is not None
+    clock[0] += 2
+    assert cache.get('k') is None
+
+
+def test_etag_match_answers_304():
+    app = Flask(__name__)
+    entry = ResponseCache().set('k', {'a': 1}, 0)
+    with app.test_request_context(headers={'If-None-Match': f'"{entry.etag}"'}):
+        response = entry.to_response('private, max-age=0')
+        assert response.status_code == 304
+        assert response.headers['Cache-Control'] == 'private, max-age=0'
+    with app.test_request_context(headers={'If-None-Match': '"other"'}):
+        response = entry.to_response()
+        assert response.status_code == 200
+        assert response.get_data() == b'{"a":1}'
+        assert response.headers['ETag'] == f'"{entry.etag}"'
@@ -0,0 +1,51 @@
+import base64
+import json
+from decimal import Decimal
+
+import pytest
+
+from config import SEARCH_CONFIG
+from routes.search import _decode_cursor, _encode_cursor, _page_params
+
+
+def test_cursor_round_trips_rank_score_exactly():
+    score = Decimal('12.345678901')
+    assert _decode_cursor(_encode_cursor(score, 42)) == (score, 42)
+
+
+def test_cursor_is_url_safe():
+    cursor = _encode_cursor(Decimal('0.000000001'), 7)
+    assert set(cursor) <= set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=')
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    base64.urlsafe_b64encode(b'{}').decode(),
+    base64.urlsafe_b64encode(json.dumps(['abc', 1]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps(['NaN', 1]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps(['1.5', 'x']).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps([[1], 1]).encode()).decode(),
+])
+def test_malformed_cursor_raises(cursor):
+    with pytest.raises((ValueError, TypeError, AttributeError)):
+        _decode_cursor(cursor)
+
+
+def test_page_params_defaults():
+    assert _page_params({}) == (1, SEARCH_CONFIG['default_page_size'])
+
+
+@pytest.mark.parametrize('data, expected', [
+    ({'page': 0, 'page_size': 0}, (1, 1)),
+    ({'page': -3, 'page_size': -10}, (1, 1)),
+    ({'page': '2', 'page_size': '5'}, (2, 5)),
+    ({'page': 3, 'page_size': 10 ** 6}, (3, SEARCH_CONFIG['max_page_size'])),
+])
+def test_page_params_are_clamped(data, expected):
+    assert _page_params(data) == expected
+
+
+@pytest.mark.parametrize('data', [{'page': 'two'}, {'page_size': None}, {'page': [1]}])
+def test_page_params_reject_non_integers(data):
+    with pytest.raises((TypeError, ValueError)):
+        _page_params(data)
@@ -0,0 +1,13 @@
+import json
+
+from lib.serialization import iter_json_list
+
+
+def test_iter_json_list_writes_fields_after_the_list():
+    body = b''.join(iter_json_list('experts', iter(range(5)), chunk_size=2,
+                                   fields={'pagination': {'page': 1, 'total_count': 5}}))
+    assert json.loads(body) == {'experts': [0, 1, 2, 3, 4], 'pagination': {'page': 1, 'total_count': 5}}
+
+
+def test_iter_json_list_handles_empty_lists():
+    assert json.loads(b''.join(iter_json_list('experts', []))) == {'experts': []}
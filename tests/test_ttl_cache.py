@@ -0,0 +1,35 @@
+import pytest
+
+from lib import response_cache
+from lib.response_cache import MISSING, TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_ttl_cache_can_store_none(clock):
+    cache = TTLCache(timeout=10)
+    assert cache.get('k') is MISSING
+    cache.set('k', None)
+    assert cache.get('k') is None
+
+
+def test_ttl_cache_expires(clock):
+    cache = TTLCache(timeout=10)
+    cache.set('k', 1)
+    clock[0] += 10
+    assert cache.get('k') is MISSING
+
+
+def test_ttl_cache_evicts_least_recently_used(clock):
+    cache = TTLCache(timeout=10, max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is MISSING
+    assert (cache.get('a'), cache.get('c')) == (1, 3)